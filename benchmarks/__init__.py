@@ -0,0 +1 @@
+"""Benchmarks for the myStrom Python bindings."""
@@ -0,0 +1,197 @@
+"""Benchmarks for the hot paths of the myStrom Python bindings.
+
+Run with ``python -m benchmarks`` from the root of the repository.
+"""
+
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+from typing import Awaitable, Callable, List, Tuple
+
+from pymystrom import (
+    RequestStatistics,
+    _request,
+    add_observer,
+    close_session,
+    configure_session,
+    remove_observer,
+)
+from pymystrom.capabilities import CAPABILITIES
+from pymystrom.discovery import DeviceRegistry, DiscoveryProtocol
+from pymystrom.switch import MyStromSwitch
+
+from .fake_server import FakeMyStromServer, device_host
+
+DEVICE_COUNTS = (1, 100, 1000)
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Return the percentile of the values in milliseconds."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percentile / 100 * (len(values) - 1))))
+    return values[index] * 1000
+
+
+def _print_result(
+    name: str, devices: int, calls: int, elapsed: float, latencies, errors: int
+):
+    """Print a single result line."""
+    print(
+        f"{name:<14} {devices:>6} devices  {calls / elapsed:>10.0f} req/s  "
+        f"p50 {_percentile(latencies, 50):>7.2f} ms  "
+        f"p99 {_percentile(latencies, 99):>7.2f} ms  "
+        f"{errors} errors"
+    )
+
+
+async def _timed(
+    rounds: List[List[Callable[[], Awaitable]]], concurrency: int
+) -> Tuple[float, List[float], int]:
+    """Run the rounds one after another and the calls of a round concurrently.
+
+    Returns the elapsed time, the latencies and the number of errors.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def _run(call):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call()
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for calls in rounds:
+        await asyncio.gather(*(_run(call) for call in calls))
+    return time.perf_counter() - start, latencies, errors
+
+
+async def bench_request(devices: int, rounds: int, concurrency: int) -> None:
+    """Measure the raw cost of ``_request`` for ``/report``."""
+    switches = [MyStromSwitch(device_host(i)) for i in range(devices)]
+    calls = [
+        [
+            (lambda switch=switch: _request(switch, uri=switch.uri / "report"))
+            for switch in switches
+        ]
+        for _ in range(rounds)
+    ]
+    elapsed, latencies, errors = await _timed(calls, concurrency)
+    _print_result("_request", devices, devices * rounds, elapsed, latencies, errors)
+
+
+async def bench_get_state(
+    server, devices: int, rounds: int, concurrency: int, name: str = "get_state"
+) -> None:
+    """Measure ``MyStromSwitch.get_state`` including the cached device info."""
+    switches = [MyStromSwitch(device_host(i)) for i in range(devices)]
+    for switch in switches:
+        # Start with the API generation unknown, as after a restart
+        CAPABILITIES.forget(switch._host)
+    requests_before = server.requests
+    calls = [[switch.get_state for switch in switches] for _ in range(rounds)]
+    elapsed, latencies, errors = await _timed(calls, concurrency)
+    requests = server.requests - requests_before
+    count = devices * rounds
+    _print_result(name, devices, count, elapsed, latencies, errors)
+    print(f"{'':<14} {requests / count:.2f} HTTP requests per get_state")
+
+
+def bench_memory(devices: int) -> None:
+    """Measure the memory used per switch after a report was parsed."""
+    report = {
+        "power": 10.5,
+        "Ws": 9.8,
+        "relay": True,
+        "temperature": 21.5,
+        "boot_id": "0000000A",
+        "energy_since_boot": 123456.7,
+        "time_since_boot": 3600,
+    }
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    switches = []
+    for index in range(devices):
+        switch = MyStromSwitch(device_host(index))
+        switch._report = type(switch.report).from_report(dict(report))
+        switches.append(switch)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    per_device = (after - before) / devices
+    print(f"{'memory':<14} {devices:>6} devices  {per_device:>10.0f} B/device")
+
+
+def bench_discovery(devices: int, rounds: int) -> None:
+    """Measure the handling of announce datagrams."""
+    registry = DeviceRegistry()
+    # The sources are replayed without delay, measure the parsing and not the
+    # rate limit
+    protocol = DiscoveryProtocol(registry, burst=float("inf"))
+    datagrams = [
+        (
+            index.to_bytes(6, "big") + bytes((106, 0x06)),
+            (f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}", 7979),
+        )
+        for index in range(devices)
+    ]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for data, addr in datagrams:
+            protocol.datagram_received(data, addr)
+    elapsed = time.perf_counter() - start
+    count = devices * rounds
+    dropped = protocol.malformed + protocol.rate_limited
+    print(
+        f"{'discovery':<14} {devices:>6} devices  {count / elapsed:>10.0f} msg/s  "
+        f"{elapsed / count * 1e6:>7.2f} us/msg  {dropped:>6} dropped"
+    )
+
+
+async def main(args) -> None:
+    """Run all benchmarks."""
+    async with FakeMyStromServer(
+        latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate
+    ) as server:
+        # The devices use the shared session, as without an own session
+        configure_session(limit=args.concurrency, resolver=server.resolver())
+        for devices in args.devices:
+            await bench_request(devices, args.rounds, args.concurrency)
+            await bench_get_state(server, devices, args.rounds, args.concurrency)
+            statistics = RequestStatistics()
+            add_observer(statistics)
+            try:
+                await bench_get_state(
+                    server, devices, args.rounds, args.concurrency, "get_state+obs"
+                )
+            finally:
+                remove_observer(statistics)
+            # Start with a cold pool for the next device count
+            await close_session()
+            bench_memory(devices)
+            bench_discovery(devices, max(args.rounds, 10))
+
+
+def _parse_args():
+    """Parse the command-line arguments."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=list(DEVICE_COUNTS))
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(_parse_args()))
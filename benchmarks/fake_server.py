@@ -0,0 +1,198 @@
+"""In-process fake myStrom devices for benchmarks."""
+
+import asyncio
+import random
+import socket
+from typing import Dict, List
+
+from aiohttp import web
+from aiohttp.abc import AbstractResolver
+
+DOMAIN = "mystrom.test"
+
+
+def device_host(index: int) -> str:
+    """Return the host name of a simulated device."""
+    return f"dev-{index}.{DOMAIN}"
+
+
+def device_mac(index: int) -> str:
+    """Return the MAC address of a simulated device."""
+    return "02:00:" + ":".join(f"{b:02X}" for b in index.to_bytes(4, "big"))
+
+
+class FakeResolver(AbstractResolver):
+    """Resolve all simulated devices to the fake server."""
+
+    def __init__(self, port: int) -> None:
+        """Initialize the resolver."""
+        self.port = port
+
+    async def resolve(self, host: str, port: int = 0, family=socket.AF_INET) -> List:
+        """Resolve a host to the local fake server."""
+        return [
+            {
+                "hostname": host,
+                "host": "127.0.0.1",
+                "port": self.port,
+                "family": socket.AF_INET,
+                "proto": 0,
+                "flags": socket.AI_NUMERICHOST,
+            }
+        ]
+
+    async def close(self) -> None:
+        """Close the resolver."""
+
+
+class FakeMyStromServer:
+    """A HTTP server that simulates many myStrom devices.
+
+    The device is selected by the ``Host`` header, so all simulated devices
+    share one listening socket.
+    """
+
+    def __init__(
+        self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0
+    ) -> None:
+        """Initialize the fake server."""
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self.port = 0
+        self._runner = None
+        self._relays: Dict[str, bool] = {}
+
+    def _index(self, request: web.Request) -> int:
+        """Return the index of the requested device."""
+        host = request.host.split(":")[0]
+        try:
+            return int(host.split(".")[0].split("-")[1])
+        except (IndexError, ValueError):
+            return 0
+
+    @web.middleware
+    async def _simulate(self, request: web.Request, handler):
+        """Add latency, jitter and failures to each request."""
+        self.requests += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.failures += 1
+            return web.Response(status=500, text="Internal error")
+        return await handler(request)
+
+    async def _report(self, request: web.Request) -> web.Response:
+        """Simulate the ``/report`` endpoint of a switch."""
+        index = self._index(request)
+        return web.json_response(
+            {
+                "power": 10.0 + random.random(),
+                "Ws": 9.8,
+                "relay": self._relays.get(request.host, True),
+                "temperature": 21.5,
+                "boot_id": f"{index:08X}",
+                "energy_since_boot": 123456.7,
+                "time_since_boot": 3600,
+            }
+        )
+
+    async def _relay(self, request: web.Request) -> web.Response:
+        """Simulate the ``/relay`` endpoint of a switch."""
+        self._relays[request.host] = request.query.get("state") == "1"
+        return web.Response(text="")
+
+    async def _info(self, request: web.Request) -> web.Response:
+        """Simulate the ``/api/v1/info`` endpoint."""
+        index = self._index(request)
+        return web.json_response(
+            {
+                "version": "3.82.60",
+                "mac": device_mac(index).replace(":", ""),
+                "type": 106,
+                "ssid": "bench",
+                "ip": "127.0.0.1",
+                "connected": True,
+            }
+        )
+
+    async def _info_legacy(self, request: web.Request) -> web.Response:
+        """Simulate the ``/info.json`` endpoint of legacy firmware."""
+        index = self._index(request)
+        return web.json_response(
+            {"version": "2.59.32", "mac": device_mac(index).replace(":", "")}
+        )
+
+    async def _sensors(self, request: web.Request) -> web.Response:
+        """Simulate the ``/api/v1/sensors`` endpoint of a PIR."""
+        return web.json_response(
+            {"motion": random.random() < 0.1, "light": 42, "temperature": 21.456}
+        )
+
+    async def _temp(self, request: web.Request) -> web.Response:
+        """Simulate the ``/temp`` endpoint."""
+        return web.json_response(
+            {"measured": 24.5, "compensation": 3.1, "compensated": 21.4}
+        )
+
+    async def _bulb(self, request: web.Request) -> web.Response:
+        """Simulate the ``/api/v1/device/<mac>`` endpoint of a bulb."""
+        mac = request.match_info["mac"]
+        return web.json_response(
+            {
+                mac: {
+                    "type": "rgblamp",
+                    "battery": False,
+                    "reachable": True,
+                    "meshroot": True,
+                    "on": True,
+                    "color": "0;0;100",
+                    "mode": "hsv",
+                    "ramp": 100,
+                    "power": 4.5,
+                    "fw_version": "2.58.0",
+                }
+            }
+        )
+
+    async def start(self) -> None:
+        """Start listening on a free local port."""
+        app = web.Application(middlewares=[self._simulate])
+        app.add_routes(
+            [
+                web.get("/report", self._report),
+                web.get("/relay", self._relay),
+                web.get("/api/v1/info", self._info),
+                web.get("/info.json", self._info_legacy),
+                web.get("/api/v1/sensors", self._sensors),
+                web.get("/temp", self._temp),
+                web.get("/api/v1/device/{mac}", self._bulb),
+                web.post("/api/v1/device/{mac}", self._bulb),
+            ]
+        )
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0, backlog=1024)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        """Stop the server."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def resolver(self) -> FakeResolver:
+        """Return a resolver that points all simulated devices to the server."""
+        return FakeResolver(self.port)
+
+    async def __aenter__(self) -> "FakeMyStromServer":
+        """Async enter."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Async exit."""
+        await self.stop()
@@ -3,6 +3,7 @@
 import asyncio
 import logging
 
+from pymystrom import close_session
 from pymystrom.bulb import MyStromBulb
 from pymystrom.discovery import discover_devices
 
@@ -66,6 +67,9 @@ async def main():
         # Shutdown the bulb
         await bulb.set_off()
 
+    # Release the connections of the shared session
+    await close_session()
+
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG)
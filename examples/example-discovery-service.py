@@ -0,0 +1,16 @@
+"""Example code for tracking myStrom devices in the network."""
+
+import asyncio
+
+from pymystrom.discovery import DiscoveryService
+
+
+async def main():
+    """Sample code to follow the announcements of myStrom devices."""
+    async with DiscoveryService() as service:
+        async for event in service:
+            print(event.type, event.device.host, event.device.mac, event.changes)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
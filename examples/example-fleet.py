@@ -0,0 +1,29 @@
+"""Example code for polling many myStrom plugs/switches at once."""
+
+import asyncio
+
+from pymystrom import close_session
+from pymystrom.fleet import MyStromFleet
+
+IP_ADDRESSES = ["192.168.0.40", "192.168.0.41", "192.168.0.42"]
+
+
+async def main():
+    """Sample code to refresh a fleet of myStrom switches."""
+    async with MyStromFleet(IP_ADDRESSES, max_concurrency=16, timeout=3) as fleet:
+        result = await fleet.refresh()
+
+        for host, switch in result.devices.items():
+            print(host, "Relay state:", switch.relay, "Power:", switch.consumption)
+
+        for host, error in result.errors.items():
+            print(host, "Error:", error)
+
+        print("Refresh took", round(result.duration, 2), "seconds")
+
+    # Release the connections of the shared session
+    await close_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
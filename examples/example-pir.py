@@ -2,6 +2,7 @@
 
 import asyncio
 
+from pymystrom import close_session
 from pymystrom.pir import MyStromPir
 
 IP_ADDRESS = "192.168.1.225"
@@ -37,6 +38,9 @@ async def main():
         await pir.get_actions()
         print("Actions:", pir.actions)
 
+    # Release the connections of the shared session
+    await close_session()
+
 
 if __name__ == "__main__":
     loop = asyncio.get_event_loop()
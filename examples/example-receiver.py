@@ -0,0 +1,27 @@
+"""Example code for receiving the actions of a myStrom PIR."""
+
+import asyncio
+
+from pymystrom import close_session
+from pymystrom.pir import MyStromPir
+from pymystrom.receiver import ActionReceiver
+
+IP_ADDRESS = "192.168.0.40"
+# Address of this host, the PIR must be able to reach it
+RECEIVER_ADDRESS = "192.168.0.10"
+
+
+async def main():
+    """Sample code to get the motion events of a myStrom PIR."""
+    async with MyStromPir(IP_ADDRESS) as pir:
+        async with ActionReceiver(RECEIVER_ADDRESS) as receiver:
+            await receiver.register(pir)
+            async for event in receiver:
+                print(event.action, event.host, pir.motion)
+
+    # Release the connections of the shared session
+    await close_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
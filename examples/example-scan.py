@@ -0,0 +1,21 @@
+"""Example code for finding myStrom devices without UDP broadcasts."""
+
+import asyncio
+
+from pymystrom import close_session
+from pymystrom.scanner import scan_network
+
+NETWORK = "192.168.0.0/24"
+
+
+async def main():
+    """Sample code to probe a network for myStrom devices."""
+    async for device in scan_network(NETWORK, concurrency=128):
+        print(type(device).__name__, device._host)
+
+    # Release the connections of the shared session
+    await close_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
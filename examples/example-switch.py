@@ -2,6 +2,7 @@
 
 import asyncio
 
+from pymystrom import close_session
 from pymystrom.switch import MyStromSwitch
 
 IP_ADDRESS = "192.168.0.40"
@@ -32,6 +33,9 @@ async def main():
         if switch.relay:
             await switch.turn_off()
 
+    # Release the connections of the shared session
+    await close_session()
+
 
 if __name__ == "__main__":
     loop = asyncio.get_event_loop()
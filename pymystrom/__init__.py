@@ -7,10 +7,115 @@ from typing import Any, Mapping, Optional
 import aiohttp
 from yarl import URL
 
-from .exceptions import MyStromConnectionError
-
+from .capabilities import CAPABILITIES, DeviceCapabilities, fetch_device_info
+from .exceptions import (
+    MyStromAuthenticationError,
+    MyStromCircuitOpenError,
+    MyStromConnectionError,
+    MyStromError,
+    MyStromHTTPError,
+)
+from .instrumentation import RequestStatistics as RequestStatistics
+from .instrumentation import RequestTrace, has_observers
+from .instrumentation import add_observer as add_observer
+from .instrumentation import remove_observer as remove_observer
+from .resilience import CIRCUIT_BREAKERS, get_retry_policy
+from .resilience import RetryPolicy as RetryPolicy
+from .resilience import set_retry_policy as set_retry_policy
+from .session import SESSION_MANAGER
+from .session import close_session as close_session
+from .session import configure_session as configure_session
+
+# Total time in seconds for a request including reading the response
 TIMEOUT = 10
+# Time in seconds to establish a connection, unreachable devices fail fast
+CONNECT_TIMEOUT = 1
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=TIMEOUT, sock_connect=CONNECT_TIMEOUT)
 USER_AGENT = "PythonMyStrom/1.0"
+# Maximum size in bytes of a response, the devices only send small documents
+MAX_RESPONSE_SIZE = 64 * 1024
+
+
+async def _send(
+    session: aiohttp.ClientSession,
+    uri: str,
+    method: str,
+    data: Optional[Any],
+    json_data: Optional[dict],
+    params: Optional[Mapping[str, str]],
+    headers: Mapping[str, str],
+    timeout: aiohttp.ClientTimeout,
+    trace: Optional[RequestTrace] = None,
+) -> Any:
+    """Send a single request and read the response.
+
+    The response is always read completely or closed before returning, so
+    the connection goes back to the pool.
+    """
+    try:
+        async with session.request(
+            method,
+            uri,
+            data=data,
+            json=json_data,
+            params=params,
+            headers=headers,
+            timeout=timeout,
+            trace_request_ctx=trace,
+        ) as response:
+            if trace is not None:
+                trace.status = response.status
+            if response.status in (401, 403):
+                raise MyStromAuthenticationError(
+                    response.status,
+                    "Error occurred while authenticating with myStrom device.",
+                )
+            if response.status == 404:
+                # Also returned by some firmware if the token is wrong
+                raise MyStromHTTPError(
+                    response.status,
+                    "Error occurred while authenticating with myStrom device.",
+                )
+            if response.status >= 400:
+                raise MyStromHTTPError(
+                    response.status,
+                    f"myStrom device responded with HTTP status {response.status}.",
+                )
+
+            body = await _read_body(response)
+            if trace is not None:
+                trace.bytes = len(body)
+            if "application/json" in response.headers.get("Content-Type", ""):
+                if not body.strip():
+                    # Some commands are answered without a body
+                    return None
+                try:
+                    return SESSION_MANAGER.json_loads(body)
+                except ValueError as exception:
+                    raise MyStromConnectionError(
+                        "Invalid JSON received from myStrom device."
+                    ) from exception
+
+            return body.decode(response.get_encoding(), errors="replace")
+    except BaseException as exception:
+        if trace is not None:
+            trace.error = type(exception).__name__
+        raise
+    finally:
+        if trace is not None:
+            trace.finish()
+
+
+async def _read_body(response: aiohttp.ClientResponse) -> bytes:
+    """Read the body of a response, bounded by MAX_RESPONSE_SIZE."""
+    if (response.content_length or 0) > MAX_RESPONSE_SIZE:
+        raise MyStromConnectionError("Response of myStrom device is too large.")
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(MAX_RESPONSE_SIZE):
+        body += chunk
+        if len(body) > MAX_RESPONSE_SIZE:
+            raise MyStromConnectionError("Response of myStrom device is too large.")
+    return bytes(body)
 
 
 async def _request(
@@ -21,8 +126,14 @@ async def _request(
     json_data: Optional[dict] = None,
     params: Optional[Mapping[str, str]] = None,
     token: Optional[str] = None,
+    timeout: Optional[aiohttp.ClientTimeout] = None,
 ) -> Any:
-    """Handle a request to the myStrom device."""
+    """Handle a request to the myStrom device.
+
+    The timeout of the call takes precedence over the one of the device.
+    Requests to a host that failed repeatedly are skipped until its circuit
+    breaker allows a probe again.
+    """
     headers = {
         "User-Agent": USER_AGENT,
         "Accept": "application/json, text/plain, */*",
@@ -30,45 +141,57 @@ async def _request(
     if token:
         headers["Token"] = token
 
-    if self._session is None:
-        self._session = aiohttp.ClientSession()
-        self._close_session = True
+    # Devices without an own session use the shared connection pool
+    session = self._session or SESSION_MANAGER.get_session()
+    if timeout is None:
+        timeout = getattr(self, "_timeout", None) or DEFAULT_TIMEOUT
 
-    try:
-        response = await asyncio.wait_for(
-            self._session.request(
-                method,
-                uri,
-                data=data,
-                json=json_data,
-                params=params,
-                headers=headers,
-            ),
-            timeout=TIMEOUT,
-        )
-    except asyncio.TimeoutError as exception:
-        raise MyStromConnectionError(
-            "Timeout occurred while connecting to myStrom device."
-        ) from exception
-    except (aiohttp.ClientError, socket.gaierror) as exception:
-        raise MyStromConnectionError(
-            "Error occurred while communicating with myStrom device."
-        ) from exception
-
-    content_type = response.headers.get("Content-Type", "")
-    if response.status == 404:
-        raise MyStromConnectionError(
-            "Error occurred while authenticating with myStrom device."
+    url = URL(uri)
+    if not CIRCUIT_BREAKERS.allow_request(url.host):
+        raise MyStromCircuitOpenError(
+            "Skipped request as the myStrom device is unreachable."
         )
 
-    elif (response.status // 100) in [4, 5]:
-        response.close()
-
-    if "application/json" in content_type:
-        response_json = await response.json()
-        return response_json
-
-    return response.text
+    retry_policy = get_retry_policy()
+    attempt = 0
+    try:
+        while True:
+            try:
+                trace = RequestTrace(url, method) if has_observers() else None
+                result = await _send(
+                    session,
+                    uri,
+                    method,
+                    data,
+                    json_data,
+                    params,
+                    headers,
+                    timeout,
+                    trace,
+                )
+            except (asyncio.TimeoutError, aiohttp.ClientError, socket.gaierror) as exc:
+                if retry_policy.should_retry(method, url.path, attempt):
+                    await asyncio.sleep(retry_policy.delay(attempt))
+                    attempt += 1
+                    continue
+                CIRCUIT_BREAKERS.record_failure(url.host)
+                if isinstance(exc, asyncio.TimeoutError):
+                    raise MyStromConnectionError(
+                        "Timeout occurred while connecting to myStrom device."
+                    ) from exc
+                raise MyStromConnectionError(
+                    "Error occurred while communicating with myStrom device."
+                ) from exc
+            except MyStromError:
+                # The device answered, it is reachable
+                CIRCUIT_BREAKERS.record_success(url.host)
+                raise
+            CIRCUIT_BREAKERS.record_success(url.host)
+            return result
+    except BaseException:
+        # Cancelled or unexpected errors must not block the host for good
+        CIRCUIT_BREAKERS.record_aborted(url.host)
+        raise
 
 
 class MyStromDevice:
@@ -78,22 +201,23 @@ class MyStromDevice:
         self,
         host,
         session: aiohttp.client.ClientSession = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
     ):
         """Initialize the device."""
         self._close_session = False
         self._host = host
         self._session = session
+        self._timeout = timeout
         self.uri = URL.build(scheme="http", host=self._host)
 
-    async def get_device_info(self) -> dict:
+    async def get_device_info(self, token: Optional[str] = None) -> dict:
         """Get the device info of a myStrom device."""
-        url = URL(self.uri).join(URL("api/v1/info"))
-        response = await _request(self, uri=url)
-        if not isinstance(response, dict):
-            # Fall back to the old API version if the device runs with old firmware
-            url = URL(self.uri).join(URL("info.json"))
-            response = await _request(self, uri=url)
-        return response
+        return await fetch_device_info(self, _request, token=token)
+
+    @property
+    def capabilities(self) -> DeviceCapabilities:
+        """Return the detected capabilities of the device."""
+        return CAPABILITIES.get(self._host)
 
     async def close(self) -> None:
         """Close an open client session."""
@@ -111,5 +235,8 @@ class MyStromDevice:
 
 async def get_device_info(host: str) -> dict:
     """Get the device info of a myStrom device."""
-    async with MyStromDevice(host) as device:
-        return await device.get_device_info()
+    try:
+        async with MyStromDevice(host) as device:
+            return await device.get_device_info()
+    finally:
+        await close_session()
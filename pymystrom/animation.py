@@ -0,0 +1,199 @@
+"""Support for animating myStrom bulbs with keyframes."""
+
+import asyncio
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+MODE_HSV = "hsv"
+# White with color temperature (1-18) and brightness (0-100)
+MODE_MONO = "mono"
+
+# Largest hue change per ramp, the ramp of the bulb may not follow the hue.
+# Ramps shorter than MIN_HUE_RAMP ms are not split, e.g. flashing colors.
+MAX_HUE_STEP = 60
+MIN_HUE_RAMP = 1000
+# Longest ramp in ms sent to a bulb
+MAX_RAMP = 10000
+# Seconds between scheduling and the first frame, so all bulbs start in sync
+LEAD_TIME = 0.05
+
+
+@dataclass(frozen=True, slots=True)
+class Keyframe:
+    """Representation of a color at a time (seconds) of an animation.
+
+    The color is interpolated linearly from the previous keyframe.
+    """
+
+    time: float
+    color: Tuple[float, ...]
+    mode: str = MODE_HSV
+
+    def format(self, color: Optional[Tuple[float, ...]] = None) -> str:
+        """Return the color as string for the bulb (e.g. ``120;100;100``)."""
+        return ";".join(str(int(round(value))) for value in color or self.color)
+
+
+@dataclass(frozen=True, slots=True)
+class Frame:
+    """Representation of a command sent at a time (seconds) of an animation.
+
+    The bulb reaches the color after ``ramp`` ms.
+    """
+
+    time: float
+    color: str
+    ramp: int
+
+
+@dataclass
+class AnimationResult:
+    """Outcome of an animation."""
+
+    sent: int = 0
+    dropped: int = 0
+    errors: Dict[str, Exception] = field(default_factory=dict)
+
+
+def _steps(start: Keyframe, end: Keyframe) -> int:
+    """Return the number of commands needed for the segment between keyframes."""
+    duration = (end.time - start.time) * 1000
+    steps = math.ceil(duration / MAX_RAMP)
+    if end.mode == MODE_HSV and start.mode == MODE_HSV:
+        hue_steps = math.ceil(abs(end.color[0] - start.color[0]) / MAX_HUE_STEP)
+        steps = max(steps, min(hue_steps, int(duration // MIN_HUE_RAMP)))
+    return max(steps, 1)
+
+
+def compile_keyframes(keyframes: Sequence[Keyframe]) -> List[Frame]:
+    """Turn keyframes into the smallest set of commands.
+
+    The ramp of the bulb does the interpolation, a segment is only split if
+    the hue changes too much or the ramp would be too long. Segments without
+    a change of the color need no command at all.
+    """
+    if not keyframes:
+        return []
+    first = keyframes[0]
+    frames = [Frame(first.time, first.format(), 0)]
+    for start, end in zip(keyframes, keyframes[1:]):
+        if start.color == end.color and start.mode == end.mode:
+            continue
+        if start.mode != end.mode:
+            # Colors of different modes can not be interpolated
+            frames.append(Frame(end.time, end.format(), 0))
+            continue
+        steps = _steps(start, end)
+        duration = (end.time - start.time) / steps
+        for step in range(1, steps + 1):
+            color = tuple(
+                a + (b - a) * step / steps for a, b in zip(start.color, end.color)
+            )
+            frames.append(
+                Frame(
+                    start.time + duration * (step - 1),
+                    end.format(color),
+                    int(round(duration * 1000)),
+                )
+            )
+    return frames
+
+
+def rainbow(duration: float) -> List[Keyframe]:
+    """Return the keyframes of a rainbow through all hues."""
+    return [Keyframe(0, (0, 100, 100)), Keyframe(duration, (359, 100, 100))]
+
+
+def sunrise(duration: float) -> List[Keyframe]:
+    """Return the keyframes of a sunrise with warm white from 0 to 100%."""
+    return [
+        Keyframe(0, (3, 0), MODE_MONO),
+        Keyframe(duration, (3, 100), MODE_MONO),
+    ]
+
+
+def flashing(
+    duration: float, hsv1: Sequence[float], hsv2: Sequence[float]
+) -> List[Keyframe]:
+    """Return the keyframes of alternating colors, each shown for a second."""
+    keyframes = []
+    colors = (tuple(hsv1), tuple(hsv2))
+    for second in range(int(duration)):
+        color = colors[second % 2]
+        if second:
+            keyframes.append(Keyframe(second - 0.1, colors[(second - 1) % 2]))
+        keyframes.append(Keyframe(second, color))
+    if keyframes:
+        # Show the last color for the rest of the duration
+        keyframes.append(Keyframe(duration, keyframes[-1].color))
+    return keyframes
+
+
+async def animate(
+    bulbs: Iterable, keyframes: Sequence[Keyframe], lead: float = LEAD_TIME
+) -> AnimationResult:
+    """Play an animation on many bulbs in sync.
+
+    The initial color is set on all bulbs first, then the frames are
+    scheduled against the monotonic clock of the event loop.
+    A frame is dropped for a bulb if its previous command is still in flight,
+    and for all bulbs if the next frame is already due. Late commands get a
+    shorter ramp, so the colors are reached on time. Returns once the
+    animation is finished.
+    """
+    bulbs = list(bulbs)
+    frames = compile_keyframes(keyframes)
+    result = AnimationResult()
+    loop = asyncio.get_running_loop()
+    in_flight: Dict[int, asyncio.Task] = {}
+
+    async def _send(bulb, frame: Frame, ramp: int) -> None:
+        try:
+            await bulb.set_color(frame.color, ramp)
+        except Exception as exception:
+            _LOGGER.debug("Animation of %s failed: %s", bulb._host, exception)
+            result.errors[bulb._host] = exception
+
+    if not frames:
+        return result
+    # Set the initial color of all bulbs before the timeline starts
+    first, frames = frames[0], frames[1:]
+    for bulb in bulbs:
+        in_flight[id(bulb)] = loop.create_task(_send(bulb, first, first.ramp))
+        result.sent += 1
+    await asyncio.gather(*in_flight.values())
+
+    # The timeline starts with the first keyframe, holds may come before frames
+    start = loop.time() + lead - first.time
+    for index, frame in enumerate(frames):
+        target = start + frame.time
+        now = loop.time()
+        if now < target:
+            await asyncio.sleep(target - now)
+            now = loop.time()
+        last = index + 1 == len(frames)
+        if not last and start + frames[index + 1].time <= now:
+            result.dropped += len(bulbs)
+            continue
+        ramp = max(0, frame.ramp - int((now - target) * 1000))
+        for bulb in bulbs:
+            task = in_flight.get(id(bulb))
+            if task is not None and not task.done():
+                if not last:
+                    result.dropped += 1
+                    continue
+                # The final color must be reached
+                await task
+            in_flight[id(bulb)] = loop.create_task(_send(bulb, frame, ramp))
+            result.sent += 1
+    await asyncio.gather(*in_flight.values())
+    # Return once the last ramp and the last keyframe are finished
+    end = start + keyframes[-1].time
+    if frames:
+        end = max(end, start + frames[-1].time + frames[-1].ramp / 1000)
+    await asyncio.sleep(max(0, end - loop.time()))
+    return result
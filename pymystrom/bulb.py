@@ -2,18 +2,70 @@
 
 import asyncio
 import logging
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 import aiohttp
 from yarl import URL
 
 from . import _request as request
+from .animation import animate, flashing, rainbow, sunrise
 
 _LOGGER = logging.getLogger(__name__)
 
 URI_BULB = URL("api/v1/device")
 
 
+class BulbWriter:
+    """Coalesce the commands to a bulb, last write wins.
+
+    Commands which arrive while a request is in flight are merged into one
+    form POST, superseded values of ``action``, ``color`` and ``ramp`` are
+    never sent. At most one request is in flight per bulb.
+    """
+
+    def __init__(self, bulb: "MyStromBulb") -> None:
+        """Initialize the writer."""
+        self._bulb = bulb
+        self._pending: Dict[str, Any] = {}
+        self._waiters: List[asyncio.Future] = []
+        self._task: Optional[asyncio.Task] = None
+        self.requests = 0
+
+    async def write(self, **fields) -> Any:
+        """Queue a command, returns the response of the request that sent it."""
+        self._pending.update(fields)
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._flush())
+        return await waiter
+
+    async def _flush(self) -> None:
+        """Send the pending commands until none are left."""
+        while self._pending:
+            fields, self._pending = self._pending, {}
+            waiters, self._waiters = self._waiters, []
+            data = "&".join("{}={}".format(key, value) for key, value in fields.items())
+            self.requests += 1
+            try:
+                response = await request(
+                    self._bulb,
+                    uri=self._bulb.uri,
+                    method="POST",
+                    data=data,
+                    token=self._bulb.token,
+                )
+            except Exception as exception:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(exception)
+            else:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(response)
+
+
 class MyStromBulb:
     """A class for a myStrom bulb."""
 
@@ -23,12 +75,19 @@ class MyStromBulb:
         mac: str,
         token: Optional[str] = None,
         session: aiohttp.client.ClientSession = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+        coalesce: bool = False,
     ) -> None:
-        """Initialize the bulb."""
+        """Initialize the bulb.
+
+        With ``coalesce`` commands sent in quick succession are merged, see
+        ``BulbWriter``.
+        """
         self._close_session = False
         self._host = host
         self._mac = mac
         self._session = session
+        self._timeout = timeout
         self.brightness = 0
         self._color = None
         self._consumption = 0
@@ -40,6 +99,7 @@ class MyStromBulb:
         self._transition_time = 0
         self.uri = URL.build(scheme="http", host=self._host).join(URI_BULB) / self._mac
         self.token = token
+        self._writer = BulbWriter(self) if coalesce else None
 
     async def get_state(self) -> None:
         """Get the state of the bulb."""
@@ -92,11 +152,17 @@ class MyStromBulb:
         """Return the current state of the bulb."""
         return self._state
 
+    async def _post(self, data, **fields):
+        """Send a command, merged with pending ones if commands are coalesced."""
+        if self._writer is not None:
+            return await self._writer.write(**fields)
+        return await request(
+            self, uri=self.uri, method="POST", data=data, token=self.token
+        )
+
     async def set_on(self):
         """Turn the bulb on with the previous settings."""
-        response = await request(
-            self, uri=self.uri, method="POST", data={"action": "on"}, token=self.token
-        )
+        response = await self._post({"action": "on"}, action="on")
         return response
 
     async def set_color_hex(self, value):
@@ -111,9 +177,7 @@ class MyStromBulb:
             "action": "on",
             "color": value,
         }
-        response = await request(
-            self, uri=self.uri, method="POST", data=data, token=self.token
-        )
+        response = await self._post(data, **data)
         return response
 
     async def set_color_hsv(self, hue, saturation, value):
@@ -125,61 +189,52 @@ class MyStromBulb:
         #     'action': 'on',
         #     'color': f"{hue};{saturation};{value}",
         # }
-        data = "action=on&color={};{};{}".format(hue, saturation, value)
-        response = await request(
-            self, uri=self.uri, method="POST", data=data, token=self.token
-        )
+        color = "{};{};{}".format(hue, saturation, value)
+        data = "action=on&color={}".format(color)
+        response = await self._post(data, action="on", color=color)
         return response
 
     async def set_white(self):
         """Turn the bulb on, full white."""
         await self.set_color_hsv(0, 0, 100)
 
+    async def set_color(self, color: str, ramp: Optional[int] = None):
+        """Turn the bulb on with a color string and an optional ramp in ms.
+
+        The color is either HSV (``120;100;100``), white with color
+        temperature and brightness (``3;50``) or HEX (``FF000000``).
+        """
+        fields = {"action": "on", "color": color}
+        if ramp is not None:
+            fields["ramp"] = int(ramp)
+        data = "&".join("{}={}".format(key, value) for key, value in fields.items())
+        response = await self._post(data, **fields)
+        return response
+
     async def set_rainbow(self, duration):
         """Turn the bulb on and create a rainbow."""
-        for i in range(0, 359):
-            await self.set_color_hsv(i, 100, 100)
-            await asyncio.sleep(duration / 359)
+        await animate([self], rainbow(duration))
 
     async def set_sunrise(self, duration):
         """Turn the bulb on and create a sunrise.
 
         The brightness is from 0 till 100.
         """
-        max_brightness = 100
-        await self.set_transition_time((duration / max_brightness))
-        for i in range(0, duration):
-            data = "action=on&color=3;{}".format(i)
-            await request(
-                self, uri=self.uri, method="POST", data=data, token=self.token
-            )
-            await asyncio.sleep(duration / max_brightness)
+        await animate([self], sunrise(duration))
 
     async def set_flashing(self, duration, hsv1, hsv2):
         """Turn the bulb on, flashing with two colors."""
-        await self.set_transition_time(100)
-        for step in range(0, int(duration / 2)):
-            await self.set_color_hsv(hsv1[0], hsv1[1], hsv1[2])
-            await asyncio.sleep(1)
-            await self.set_color_hsv(hsv2[0], hsv2[1], hsv2[2])
-            await asyncio.sleep(1)
+        await animate([self], flashing(duration, hsv1, hsv2))
 
     async def set_transition_time(self, value):
         """Set the transition time in ms."""
-        response = await request(
-            self,
-            uri=self.uri,
-            method="POST",
-            data={"ramp": int(round(value))},
-            token=self.token,
-        )
+        data = {"ramp": int(round(value))}
+        response = await self._post(data, **data)
         return response
 
     async def set_off(self):
         """Turn the bulb off."""
-        response = await request(
-            self, uri=self.uri, method="POST", data={"action": "off"}, token=self.token
-        )
+        response = await self._post({"action": "off"}, action="off")
         return response
 
     async def close(self) -> None:
@@ -0,0 +1,156 @@
+"""Support for remembering the capabilities of myStrom devices."""
+
+import json
+import logging
+import os
+import tempfile
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Optional
+
+from yarl import URL
+
+from .exceptions import MyStromAuthenticationError, MyStromHTTPError
+
+_LOGGER = logging.getLogger(__name__)
+
+# Legacy firmware only provides ``/info.json``
+API_V1 = 1
+# Newer firmware provides ``/api/v1/info``
+API_V2 = 2
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """Write data as JSON, readers never see a partially written file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".pymystrom-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@dataclass
+class DeviceCapabilities:
+    """Representation of the detected capabilities of a device."""
+
+    host: str
+    api_version: Optional[int] = None
+    endpoints: Dict[str, bool] = field(default_factory=dict)
+    token_required: Optional[bool] = None
+
+    def supports(self, endpoint: str) -> Optional[bool]:
+        """Return if an endpoint is supported, None if not yet known."""
+        return self.endpoints.get(endpoint)
+
+    def set_supported(self, endpoint: str, supported: bool) -> None:
+        """Record if an endpoint is supported."""
+        self.endpoints[endpoint] = supported
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DeviceCapabilities":
+        """Create the capabilities from a stored record."""
+        return cls(
+            host=data["host"],
+            api_version=data.get("api_version"),
+            endpoints=dict(data.get("endpoints", {})),
+            token_required=data.get("token_required"),
+        )
+
+
+class CapabilityRegistry:
+    """Representation of the per-host capability records."""
+
+    def __init__(self, path: Optional[str] = None):
+        """Initialize the registry, optionally backed by a JSON file."""
+        self.path = path
+        self._capabilities: Dict[str, DeviceCapabilities] = {}
+
+    def get(self, host: str) -> DeviceCapabilities:
+        """Get the capabilities of a host, creating an empty record if needed."""
+        capabilities = self._capabilities.get(host)
+        if capabilities is None:
+            capabilities = self._capabilities[host] = DeviceCapabilities(host)
+        return capabilities
+
+    def forget(self, host: str) -> None:
+        """Drop the record of a host, e.g. after a firmware update."""
+        self._capabilities.pop(host, None)
+
+    def clear(self) -> None:
+        """Drop all records."""
+        self._capabilities.clear()
+
+    def load(self, path: Optional[str] = None) -> None:
+        """Load the records from disk."""
+        path = path or self.path
+        if path is None:
+            return
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exception:
+            _LOGGER.warning("Unable to load capabilities from %s: %s", path, exception)
+            return
+        for record in data:
+            capabilities = DeviceCapabilities.from_dict(record)
+            self._capabilities[capabilities.host] = capabilities
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the records to disk atomically."""
+        path = path or self.path
+        if path is None:
+            return
+        write_json_atomic(
+            path, [asdict(record) for record in self._capabilities.values()]
+        )
+
+
+CAPABILITIES = CapabilityRegistry()
+
+
+async def fetch_device_info(
+    device, request: Callable, token: Optional[str] = None
+) -> dict:
+    """Get the device info, probing the API version only once per host."""
+    capabilities = CAPABILITIES.get(device._host)
+    base = URL.build(scheme="http", host=device._host)
+
+    try:
+        if capabilities.api_version != API_V1:
+            # Try the new API (Devices with newer firmware)
+            url = base.join(URL("api/v1/info"))
+            try:
+                response = await request(device, uri=url, token=token)
+            except MyStromAuthenticationError:
+                raise
+            except MyStromHTTPError as exception:
+                if exception.status != 404:
+                    raise
+                response = None
+            if isinstance(response, dict):
+                capabilities.api_version = API_V2
+                if token is None:
+                    capabilities.token_required = False
+                return response
+
+        # Fall back to the old API version if the device runs with old firmware
+        url = base.join(URL("info.json"))
+        response = await request(device, uri=url, token=token)
+    except MyStromAuthenticationError:
+        if token is None:
+            capabilities.token_required = True
+        raise
+
+    if isinstance(response, dict):
+        capabilities.api_version = API_V1
+        if token is None:
+            capabilities.token_required = False
+    else:
+        # Probe again next time, the firmware may have changed
+        capabilities.api_version = None
+    return response
@@ -6,6 +6,7 @@ import asyncio
 
 from functools import wraps
 
+from pymystrom import close_session
 from pymystrom.bulb import MyStromBulb
 
 URI = "api/v1/device"
@@ -15,10 +16,17 @@ TIMEOUT = 5
 def coro(f):
     """Allow to use async in click."""
 
+    async def run(*args, **kwargs):
+        """Run the command and release the shared connections."""
+        try:
+            return await f(*args, **kwargs)
+        finally:
+            await close_session()
+
     @wraps(f)
     def wrapper(*args, **kwargs):
         """Async wrapper."""
-        return asyncio.run(f(*args, **kwargs))
+        return asyncio.run(run(*args, **kwargs))
 
     return wrapper
 
@@ -2,50 +2,120 @@
 
 import asyncio
 import logging
-from typing import List, Optional
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Iterable, List, Optional, Set, Tuple
 
 from .device_types import DEVICE_MAPPING_NUMERIC
 
 _LOGGER = logging.getLogger(__name__)
 
+DISCOVERY_PORT = 7979
+# Devices announce themselves every ~5 seconds
+EXPIRE_AFTER = 30.0
+
+EVENT_ADDED = "added"
+EVENT_CHANGED = "changed"
+EVENT_EXPIRED = "expired"
+
+# Announcements per source which may arrive at once and per second
+ANNOUNCE_BURST = 4
+ANNOUNCE_RATE = 1.0
+# Number of sources tracked for rate limiting before the table is reset
+MAX_SOURCES = 4096
+
+
+# MAC address (6 bytes), device type and status bits
+ANNOUNCE_MESSAGE = struct.Struct("6sBB")
+
+STATUS_IS_CHILD = 1
+STATUS_MYSTROM_REGISTERED = 2
+STATUS_MYSTROM_ONLINE = 4
+STATUS_RESTARTED = 8
+
+STATUS_ATTRIBUTES = (
+    (STATUS_IS_CHILD, "is_child"),
+    (STATUS_MYSTROM_REGISTERED, "mystrom_registered"),
+    (STATUS_MYSTROM_ONLINE, "mystrom_online"),
+    (STATUS_RESTARTED, "restarted"),
+)
+
 
 class DiscoveredDevice(object):
     """Representation of discovered device."""
 
+    __slots__ = ("host", "mac", "type", "status", "last_seen")
+
     mac: str
     type: int
-    is_child: bool
-    mystrom_registered: bool
-    mystrom_online: bool
-    restarted: bool
 
     @staticmethod
     def create_from_announce_msg(raw_addr, announce_msg):
         """Create announce message."""
-        _LOGGER.debug("Received announce message '%s' from %s ", announce_msg, raw_addr)
-        if len(announce_msg) != 8:
+        if len(announce_msg) != ANNOUNCE_MESSAGE.size:
             raise RuntimeError("Unexpected announcement, '%s'" % announce_msg)
 
-        device = DiscoveredDevice(host=raw_addr[0], mac=announce_msg[0:6].hex(":"))
-        device.type = announce_msg[6]
-
-        if device.type == "102":
-            device.hardware = DEVICE_MAPPING_NUMERIC[int(announce_msg[6])]
-        else:
-            device.hardware = "non_mystrom"
-        status = announce_msg[7]
-
-        # Parse status field
-        device.is_child = status & 1 != 0
-        device.mystrom_registered = status & 2 != 0
-        device.mystrom_online = status & 4 != 0
-        device.restarted = status & 8 != 0
+        raw_mac, device_type, status = ANNOUNCE_MESSAGE.unpack_from(announce_msg)
+        device = DiscoveredDevice(host=raw_addr[0], mac=raw_mac.hex(":"))
+        device.type = device_type
+        device.status = status
         return device
 
     def __init__(self, host, mac):
         """Initialize the discovery."""
         self.host = host
         self.mac = mac
+        self.type = None
+        self.status = 0
+        self.last_seen = time.monotonic()
+
+    @property
+    def hardware(self) -> str:
+        """Return the name of the device type."""
+        return DEVICE_MAPPING_NUMERIC.get(self.type, "non_mystrom")
+
+    @property
+    def is_child(self) -> bool:
+        """Return True if the device is a child in a mesh."""
+        return self.status & STATUS_IS_CHILD != 0
+
+    @property
+    def mystrom_registered(self) -> bool:
+        """Return True if the device is registered with myStrom."""
+        return self.status & STATUS_MYSTROM_REGISTERED != 0
+
+    @property
+    def mystrom_online(self) -> bool:
+        """Return True if the device is connected to the myStrom cloud."""
+        return self.status & STATUS_MYSTROM_ONLINE != 0
+
+    @property
+    def restarted(self) -> bool:
+        """Return True if the device was restarted recently."""
+        return self.status & STATUS_RESTARTED != 0
+
+
+@dataclass(frozen=True)
+class DiscoveryEvent:
+    """Representation of a change of a discovered device."""
+
+    type: str
+    device: DiscoveredDevice
+    changes: Tuple[str, ...] = ()
+
+
+def _changes(known: DiscoveredDevice, host: str, device_type: int, status: int):
+    """Return the names of the changed attributes."""
+    changes = []
+    if known.host != host:
+        changes.append("host")
+    if known.type != device_type:
+        changes.append("type")
+    changed_bits = known.status ^ status
+    if changed_bits:
+        changes.extend(name for bit, name in STATUS_ATTRIBUTES if changed_bits & bit)
+    return tuple(changes)
 
 
 class DeviceRegistry(object):
@@ -54,10 +124,59 @@ class DeviceRegistry(object):
     def __init__(self):
         """Initialize the device registry."""
         self.devices_by_mac = {}
+        self._devices_by_raw_mac = {}
+
+    def register(self, device) -> Optional[DiscoveryEvent]:
+        """Register a device, returns an event if it is new or changed."""
+        raw_mac = bytes.fromhex(device.mac.replace(":", ""))
+        known = self.devices_by_mac.get(device.mac)
+        self.devices_by_mac[device.mac] = device
+        self._devices_by_raw_mac[raw_mac] = device
+        if known is None:
+            return DiscoveryEvent(EVENT_ADDED, device)
+        changes = _changes(known, device.host, device.type, device.status)
+        if changes:
+            return DiscoveryEvent(EVENT_CHANGED, device, changes)
+        return None
+
+    def announce(
+        self, host: str, raw_mac: bytes, device_type: int, status: int
+    ) -> Optional[DiscoveryEvent]:
+        """Handle an announcement, known devices are updated in place."""
+        known = self._devices_by_raw_mac.get(raw_mac)
+        if known is not None:
+            known.last_seen = time.monotonic()
+            if (
+                known.status == status
+                and known.type == device_type
+                and known.host == host
+            ):
+                return None
+            changes = _changes(known, host, device_type, status)
+            known.host = host
+            known.type = device_type
+            known.status = status
+            return DiscoveryEvent(EVENT_CHANGED, known, changes)
 
-    def register(self, device):
-        """Register a device."""
+        device = DiscoveredDevice(host=host, mac=raw_mac.hex(":"))
+        device.type = device_type
+        device.status = status
         self.devices_by_mac[device.mac] = device
+        self._devices_by_raw_mac[bytes(raw_mac)] = device
+        return DiscoveryEvent(EVENT_ADDED, device)
+
+    def expire(self, max_age: float) -> List[DiscoveryEvent]:
+        """Remove the devices not seen within max_age seconds."""
+        deadline = time.monotonic() - max_age
+        expired = [
+            (raw_mac, device)
+            for raw_mac, device in self._devices_by_raw_mac.items()
+            if device.last_seen < deadline
+        ]
+        for raw_mac, device in expired:
+            del self._devices_by_raw_mac[raw_mac]
+            self.devices_by_mac.pop(device.mac, None)
+        return [DiscoveryEvent(EVENT_EXPIRED, device) for _, device in expired]
 
     def devices(self):
         """Get all present devices."""
@@ -67,20 +186,63 @@ class DeviceRegistry(object):
 class DiscoveryProtocol(asyncio.DatagramProtocol):
     """Representation of the discovery protocol."""
 
-    def __init__(self, registry: DeviceRegistry):
+    def __init__(
+        self,
+        registry: DeviceRegistry,
+        callback: Optional[Callable[[DiscoveryEvent], None]] = None,
+        burst: int = ANNOUNCE_BURST,
+        rate: float = ANNOUNCE_RATE,
+    ):
         """ "Initialize the discovery protocol."""
         super().__init__()
         self.registry = registry
+        self.callback = callback
+        self.burst = burst
+        self.rate = rate
+        self.received = 0
+        self.malformed = 0
+        self.rate_limited = 0
+        # Per source: available tokens and time of the last update
+        self._buckets = {}
 
     def connection_made(self, transport):
         """Create an UDP listener."""
         _LOGGER.debug("Starting up UDP listener")
         self.transport = transport
 
+    def _allow(self, source: str) -> bool:
+        """Return True if the source is within its rate limit."""
+        now = time.monotonic()
+        bucket = self._buckets.get(source)
+        if bucket is None:
+            if len(self._buckets) >= MAX_SOURCES:
+                self._buckets.clear()
+            self._buckets[source] = [self.burst - 1, now]
+            return True
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            return False
+        bucket[0] = tokens - 1
+        return True
+
     def datagram_received(self, data, addr):
-        """Handle a datagram."""
-        device = DiscoveredDevice.create_from_announce_msg(addr, data)
-        self.registry.register(device)
+        """Handle a datagram, malformed or flooding datagrams are dropped."""
+        self.received += 1
+        if len(data) != ANNOUNCE_MESSAGE.size:
+            self.malformed += 1
+            return
+        if not self._allow(addr[0]):
+            self.rate_limited += 1
+            return
+        raw_mac, device_type, status = ANNOUNCE_MESSAGE.unpack_from(data)
+        event = self.registry.announce(addr[0], raw_mac, device_type, status)
+        if event is not None:
+            if event.type == EVENT_ADDED:
+                _LOGGER.debug("Found myStrom device %s (%s)", event.device.mac, addr[0])
+            if self.callback is not None:
+                self.callback(event)
 
     def connection_lost(self, exc: Optional[Exception]) -> None:
         """Stop if connection is lost."""
@@ -88,21 +250,175 @@ class DiscoveryProtocol(asyncio.DatagramProtocol):
         super().connection_lost(exc)
 
 
-async def discover_devices(timeout: int = 7) -> List[DiscoveredDevice]:
-    """Discover local myStrom devices.
+class DiscoveryService:
+    """A long-running listener for the announcements of myStrom devices.
 
-    Some myStrom devices report their presence every ~5 seconds in an UDP
-    broadcast to port 7979.
+    Subscribers are informed when a device is added, when its status changes
+    (e.g. ``restarted`` or ``mystrom_online``) and when it expired because it
+    was not seen for ``expire_after`` seconds. A ``DeviceInventory`` is kept
+    up to date with the announced devices.
+    """
+
+    def __init__(
+        self,
+        expire_after: float = EXPIRE_AFTER,
+        host: str = "0.0.0.0",
+        port: int = DISCOVERY_PORT,
+        inventory=None,
+    ) -> None:
+        """Initialize the discovery service."""
+        self.expire_after = expire_after
+        self.host = host
+        self.port = port
+        self.registry = DeviceRegistry()
+        self._subscribers: List[Callable[[DiscoveryEvent], None]] = []
+        self._transport = None
+        self._expire_task: Optional[asyncio.Task] = None
+        if inventory is not None:
+            inventory.attach(self)
+
+    @property
+    def devices(self) -> List[DiscoveredDevice]:
+        """Return the currently present devices."""
+        return self.registry.devices()
+
+    @property
+    def running(self) -> bool:
+        """Return True if the service is listening."""
+        return self._transport is not None
+
+    def subscribe(
+        self, callback: Callable[[DiscoveryEvent], None]
+    ) -> Callable[[], None]:
+        """Subscribe to device events, returns a function to unsubscribe."""
+        self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            """Remove the subscription."""
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _publish(self, event: DiscoveryEvent) -> None:
+        """Pass an event to all subscribers."""
+        _LOGGER.debug("Device %s %s", event.device.mac, event.type)
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception:
+                _LOGGER.exception("Error in discovery subscriber %s", callback)
+
+    async def events(self) -> AsyncIterator[DiscoveryEvent]:
+        """Iterate over the device events as they occur."""
+        queue: asyncio.Queue = asyncio.Queue()
+        unsubscribe = self.subscribe(queue.put_nowait)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            unsubscribe()
+
+    def __aiter__(self) -> AsyncIterator[DiscoveryEvent]:
+        """Iterate over the device events as they occur."""
+        return self.events()
+
+    async def _expire(self) -> None:
+        """Periodically remove devices which are no longer announced."""
+        interval = max(self.expire_after / 4, 0.1)
+        while True:
+            await asyncio.sleep(interval)
+            for event in self.registry.expire(self.expire_after):
+                self._publish(event)
+
+    async def start(self) -> None:
+        """Start listening for announcements."""
+        if self.running:
+            return
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: DiscoveryProtocol(self.registry, self._publish),
+            local_addr=(self.host, self.port),
+        )
+        self._expire_task = loop.create_task(self._expire())
+
+    async def stop(self) -> None:
+        """Stop listening for announcements."""
+        if self._expire_task is not None:
+            self._expire_task.cancel()
+            try:
+                await self._expire_task
+            except asyncio.CancelledError:
+                pass
+            self._expire_task = None
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def __aenter__(self) -> "DiscoveryService":
+        """Async enter."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Async exit."""
+        await self.stop()
+
+
+def normalize_mac(mac: str) -> str:
+    """Return a MAC address in the format of the discovery (aa:bb:cc:dd:ee:ff)."""
+    digits = "".join(c for c in mac.lower() if c in "0123456789abcdef")
+    return ":".join(digits[i : i + 2] for i in range(0, len(digits), 2))
+
+
+@dataclass
+class DiscoveryResult:
+    """Outcome of a discovery with expected devices."""
+
+    devices: List[DiscoveredDevice] = field(default_factory=list)
+    missing: Set[str] = field(default_factory=set)
+
+
+async def wait_for_devices(
+    timeout: float = 7,
+    expected_count: Optional[int] = None,
+    expected_macs: Optional[Iterable[str]] = None,
+    host: str = "0.0.0.0",
+    port: int = DISCOVERY_PORT,
+    inventory=None,
+) -> DiscoveryResult:
+    """Discover local myStrom devices and return once the expected ones are seen.
+
+    Without expectations the full timeout is waited. The expected MAC
+    addresses which were not seen until the timeout are reported as missing.
+    The discovered devices are recorded in the ``inventory`` if given.
     """
+    expected = {normalize_mac(mac) for mac in expected_macs or ()}
     registry = DeviceRegistry()
-    loop = asyncio.get_event_loop()
+    satisfied = asyncio.Event()
+
+    def _check(event: DiscoveryEvent) -> None:
+        """Check if all expected devices were seen."""
+        if event.type != EVENT_ADDED or (expected_count is None and not expected):
+            return
+        if expected_count is not None and len(registry.devices_by_mac) < expected_count:
+            return
+        if not expected.issubset(registry.devices_by_mac):
+            return
+        satisfied.set()
+
+    loop = asyncio.get_running_loop()
     (transport, protocol) = await loop.create_datagram_endpoint(
-        lambda: DiscoveryProtocol(registry), local_addr=("0.0.0.0", 7979)
+        lambda: DiscoveryProtocol(registry, _check), local_addr=(host, port)
     )
-    # Server runs in the background, meanwhile wait until timeout expires
-    await asyncio.sleep(timeout)
-    # Shutdown server
-    transport.close()
+    # Server runs in the background, meanwhile wait until satisfied or timeout
+    try:
+        await asyncio.wait_for(satisfied.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        # Shutdown server
+        transport.close()
 
     devices = registry.devices()
     for device in devices:
@@ -112,4 +428,26 @@ async def discover_devices(timeout: int = 7) -> List[DiscoveredDevice]:
             device.type,
             device.mac,
         )
-    return devices
+    if inventory is not None:
+        changed = [inventory.update_from_discovered(device) for device in devices]
+        if any(changed):
+            await inventory.save_async()
+    missing = expected.difference(registry.devices_by_mac)
+    if missing:
+        _LOGGER.debug("Expected myStrom devices not found: %s", sorted(missing))
+    return DiscoveryResult(devices, missing)
+
+
+async def discover_devices(
+    timeout: int = 7,
+    expected_count: Optional[int] = None,
+    expected_macs: Optional[Iterable[str]] = None,
+) -> List[DiscoveredDevice]:
+    """Discover local myStrom devices.
+
+    Some myStrom devices report their presence every ~5 seconds in an UDP
+    broadcast to port 7979. If expected devices are given, the discovery
+    returns as soon as they were seen.
+    """
+    result = await wait_for_devices(timeout, expected_count, expected_macs)
+    return result.devices
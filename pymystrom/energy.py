@@ -0,0 +1,163 @@
+"""Support for accumulating the energy measured by myStrom switches/plugs."""
+
+import time
+from array import array
+from typing import Iterator, List, Optional, Tuple
+
+from .switch import MyStromSwitch, SwitchReport
+
+WS_PER_KWH = 3_600_000
+# Samples per ring buffer, 6 hours of 1-minute and a week of 1-hour buckets
+RAW_SAMPLES = 120
+MINUTE_SAMPLES = 360
+HOUR_SAMPLES = 168
+
+
+class RingBuffer:
+    """A fixed-size buffer of timestamps (int64) and values (float64)."""
+
+    __slots__ = ("times", "values", "capacity", "start", "size")
+
+    def __init__(self, capacity: int) -> None:
+        """Initialize the buffer, the memory is allocated once."""
+        self.times = array("q", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.capacity = capacity
+        self.start = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        """Return the number of samples."""
+        return self.size
+
+    def __iter__(self) -> Iterator[Tuple[int, float]]:
+        """Iterate over the samples from the oldest to the newest."""
+        for offset in range(self.size):
+            index = (self.start + offset) % self.capacity
+            yield self.times[index], self.values[index]
+
+    def append(self, timestamp: int, value: float) -> None:
+        """Add a sample, the oldest one is dropped if the buffer is full."""
+        index = (self.start + self.size) % self.capacity
+        self.times[index] = timestamp
+        self.values[index] = value
+        if self.size < self.capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def last(self) -> Optional[Tuple[int, float]]:
+        """Return the newest sample."""
+        if not self.size:
+            return None
+        index = (self.start + self.size - 1) % self.capacity
+        return self.times[index], self.values[index]
+
+    def replace_last(self, value: float) -> None:
+        """Replace the value of the newest sample."""
+        self.values[(self.start + self.size - 1) % self.capacity] = value
+
+    def bucket(self, timestamp: int, value: float) -> None:
+        """Record the value of a bucket, the newest sample is updated in place."""
+        last = self.last()
+        if last is not None and last[0] == timestamp:
+            self.replace_last(value)
+        else:
+            self.append(timestamp, value)
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the sample arrays in bytes."""
+        return (self.times.itemsize + self.values.itemsize) * self.capacity
+
+
+class EnergyAccumulator:
+    """A monotonic energy counter in kWh built from successive reports.
+
+    The counter is based on ``energy_since_boot`` and continues across
+    restarts of the device, which are detected by a new ``boot_id``. Legacy
+    firmware without these fields is supported by integrating ``Ws`` (the
+    average power since the last report) over time. The counter is recorded
+    as raw samples and in 1-minute and 1-hour buckets.
+    """
+
+    __slots__ = (
+        "total",
+        "raw",
+        "minutes",
+        "hours",
+        "_boot_id",
+        "_energy_since_boot",
+        "_timestamp",
+    )
+
+    def __init__(
+        self,
+        raw_samples: int = RAW_SAMPLES,
+        minute_samples: int = MINUTE_SAMPLES,
+        hour_samples: int = HOUR_SAMPLES,
+        total: float = 0.0,
+    ) -> None:
+        """Initialize the accumulator, optionally with a stored total in kWh."""
+        self.total = total
+        self.raw = RingBuffer(raw_samples)
+        self.minutes = RingBuffer(minute_samples)
+        self.hours = RingBuffer(hour_samples)
+        self._boot_id: Optional[str] = None
+        self._energy_since_boot: Optional[float] = None
+        self._timestamp: Optional[float] = None
+
+    def _energy(self, report: SwitchReport, timestamp: float) -> float:
+        """Return the energy in Ws consumed since the previous report."""
+        energy = report.energy_since_boot
+        if energy is not None:
+            previous = self._energy_since_boot
+            restarted = report.boot_id != self._boot_id
+            self._boot_id = report.boot_id
+            self._energy_since_boot = energy
+            if previous is None:
+                # The first report is only the baseline
+                return 0.0
+            if restarted or energy < previous:
+                # The counter was reset, count what was consumed since
+                return energy
+            return energy - previous
+        if self._timestamp is None or report.Ws is None:
+            return 0.0
+        return max(report.Ws, 0.0) * max(timestamp - self._timestamp, 0.0)
+
+    def add_report(
+        self, report: SwitchReport, timestamp: Optional[float] = None
+    ) -> float:
+        """Add a report, returns the energy in kWh consumed since the previous."""
+        if timestamp is None:
+            timestamp = time.time()
+        delta = self._energy(report, timestamp) / WS_PER_KWH
+        self._timestamp = timestamp
+        self.total += delta
+        seconds = int(timestamp)
+        self.raw.append(seconds, self.total)
+        self.minutes.bucket(seconds - seconds % 60, self.total)
+        self.hours.bucket(seconds - seconds % 3600, self.total)
+        return delta
+
+    def add(self, switch: MyStromSwitch, timestamp: Optional[float] = None) -> float:
+        """Add the latest report of a switch/plug."""
+        return self.add_report(switch.report, timestamp)
+
+    @staticmethod
+    def consumption(buffer: RingBuffer) -> List[Tuple[int, float]]:
+        """Return the energy in kWh consumed per bucket of a buffer.
+
+        The first bucket is skipped, the counter before it is not known.
+        """
+        samples = list(buffer)
+        return [
+            (timestamp, value - previous)
+            for (_, previous), (timestamp, value) in zip(samples, samples[1:])
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        """Return the size of the sample arrays in bytes."""
+        return self.raw.nbytes + self.minutes.nbytes + self.hours.nbytes
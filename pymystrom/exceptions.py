@@ -17,3 +17,24 @@ class MyStromNotVersionTwoSwitch(MyStromError):
     """When version 2 function is not supported."""
 
     pass
+
+
+class MyStromCircuitOpenError(MyStromConnectionError):
+    """When requests to a device are skipped as it failed repeatedly."""
+
+    pass
+
+
+class MyStromHTTPError(MyStromConnectionError):
+    """When the device answers with an HTTP error status."""
+
+    def __init__(self, status: int, message: str) -> None:
+        """Initialize the exception with the HTTP status."""
+        super().__init__(message)
+        self.status = status
+
+
+class MyStromAuthenticationError(MyStromHTTPError):
+    """When the device rejects the request due to a missing or wrong token."""
+
+    pass
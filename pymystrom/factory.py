@@ -0,0 +1,98 @@
+"""Support for creating device objects from discovered myStrom devices."""
+
+import logging
+from typing import Iterable, Optional, Type, Union
+
+import aiohttp
+
+from .bulb import MyStromBulb
+from .device_types import DEVICE_MAPPING_LITERAL, DEVICE_MAPPING_NUMERIC
+from .discovery import DiscoveredDevice
+from .fleet import Device, MyStromFleet
+from .pir import MyStromPir
+from .switch import MyStromSwitch
+
+_LOGGER = logging.getLogger(__name__)
+
+# Device classes by the names of DEVICE_MAPPING_NUMERIC, buttons are not polled
+DEVICE_CLASSES = {
+    DEVICE_MAPPING_NUMERIC[101]: MyStromSwitch,
+    DEVICE_MAPPING_NUMERIC[102]: MyStromBulb,
+    DEVICE_MAPPING_NUMERIC[105]: MyStromBulb,
+    DEVICE_MAPPING_NUMERIC[106]: MyStromSwitch,
+    DEVICE_MAPPING_NUMERIC[107]: MyStromSwitch,
+    DEVICE_MAPPING_NUMERIC[110]: MyStromPir,
+    DEVICE_MAPPING_NUMERIC[120]: MyStromSwitch,
+}
+
+
+def device_class(device_type: Union[int, str, None]) -> Optional[Type[Device]]:
+    """Return the class for a numeric or literal device type."""
+    if isinstance(device_type, int):
+        name = DEVICE_MAPPING_NUMERIC.get(device_type)
+    elif isinstance(device_type, str):
+        name = DEVICE_MAPPING_LITERAL.get(device_type)
+    else:
+        name = None
+    return DEVICE_CLASSES.get(name)
+
+
+def bulb_mac(mac: str) -> str:
+    """Return a MAC address in the format used by the bulb API (5CCF7FA0C27C)."""
+    return "".join(c for c in mac if c.isalnum()).upper()
+
+
+def create_device(
+    host: str,
+    device_type: Union[int, str, None],
+    mac: Optional[str] = None,
+    session: aiohttp.client.ClientSession = None,
+    token: Optional[str] = None,
+) -> Optional[Device]:
+    """Create the device object for a device type, None if not supported."""
+    cls = device_class(device_type)
+    if cls is MyStromBulb:
+        if mac is None:
+            return None
+        return MyStromBulb(host, bulb_mac(mac), token=token, session=session)
+    if cls is not None:
+        return cls(host, session=session, token=token)
+    return None
+
+
+def create_from_discovered(
+    discovered: DiscoveredDevice,
+    session: aiohttp.client.ClientSession = None,
+    token: Optional[str] = None,
+) -> Optional[Device]:
+    """Create the device object for a discovered device."""
+    return create_device(
+        discovered.host, discovered.type, discovered.mac, session=session, token=token
+    )
+
+
+async def create_fleet(
+    discovered: Iterable[DiscoveredDevice],
+    session: aiohttp.client.ClientSession = None,
+    token: Optional[str] = None,
+    warm: bool = False,
+    **kwargs,
+) -> MyStromFleet:
+    """Create a fleet of device objects from discovered devices.
+
+    Unsupported devices (e.g. buttons) are skipped. With ``warm`` the first
+    state of all devices is fetched concurrently, see ``MyStromFleet.last_result``.
+    """
+    devices = []
+    for device in discovered:
+        created = create_from_discovered(device, session=session, token=token)
+        if created is None:
+            _LOGGER.debug(
+                "Skipping unsupported device %s (%s)", device.mac, device.type
+            )
+            continue
+        devices.append(created)
+    fleet = MyStromFleet(devices, session=session, token=token, **kwargs)
+    if warm:
+        await fleet.refresh()
+    return fleet
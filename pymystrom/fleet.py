@@ -0,0 +1,135 @@
+"""Support for refreshing many myStrom devices concurrently."""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Union
+
+import aiohttp
+
+from .bulb import MyStromBulb
+from .exceptions import MyStromConnectionError
+from .pir import MyStromPir
+from .switch import MyStromSwitch
+
+_LOGGER = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = 32
+DEVICE_TIMEOUT = 5.0
+
+Device = Union[MyStromSwitch, MyStromBulb, MyStromPir]
+
+
+async def refresh_device(device: Device) -> None:
+    """Fetch the state of a single device."""
+    if isinstance(device, MyStromPir):
+        await device.get_sensors_state()
+    else:
+        await device.get_state()
+
+
+@dataclass
+class FleetResult:
+    """Outcome of a fleet refresh."""
+
+    devices: Dict[str, Device] = field(default_factory=dict)
+    errors: Dict[str, Exception] = field(default_factory=dict)
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        """Return True if every device was refreshed."""
+        return not self.errors
+
+
+class MyStromFleet:
+    """A class for a group of myStrom devices that are polled together."""
+
+    def __init__(
+        self,
+        devices: Iterable[Union[str, Device]],
+        session: aiohttp.client.ClientSession = None,
+        token: Optional[str] = None,
+        max_concurrency: int = MAX_CONCURRENCY,
+        timeout: float = DEVICE_TIMEOUT,
+        stagger: float = 0.0,
+    ) -> None:
+        """Initialize the fleet.
+
+        Plain hosts are treated as switches/plugs. If a session is given, it is
+        used for all devices without an own session, otherwise the shared
+        connection pool is used.
+        """
+        self._session = session
+        self._token = token
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout = timeout
+        self.stagger = stagger
+        self._devices: Dict[str, Device] = {}
+        self.last_result: Optional[FleetResult] = None
+        for device in devices:
+            self.add(device)
+
+    def add(self, device: Union[str, Device]) -> Device:
+        """Add a host or a device object to the fleet."""
+        if isinstance(device, str):
+            device = MyStromSwitch(device, session=self._session, token=self._token)
+        elif device._session is None:
+            device._session = self._session
+        self._devices[device._host] = device
+        return device
+
+    @property
+    def devices(self) -> List[Device]:
+        """Return all devices of the fleet."""
+        return list(self._devices.values())
+
+    async def _refresh(self, host: str, device: Device, result: FleetResult) -> None:
+        """Refresh a device and record the outcome."""
+        if self.stagger:
+            await asyncio.sleep(random.uniform(0, self.stagger))
+        async with self._semaphore:
+            try:
+                await asyncio.wait_for(refresh_device(device), self.timeout)
+            except asyncio.TimeoutError as exception:
+                error = MyStromConnectionError(
+                    "Timeout occurred while refreshing myStrom device."
+                )
+                error.__cause__ = exception
+                result.errors[host] = error
+            except Exception as exception:
+                _LOGGER.debug("Refreshing %s failed: %s", host, exception)
+                result.errors[host] = exception
+            else:
+                result.devices[host] = device
+
+    async def refresh(self) -> FleetResult:
+        """Refresh all devices concurrently.
+
+        Errors are collected per host instead of being raised.
+        """
+        result = FleetResult()
+        start = time.monotonic()
+        await asyncio.gather(
+            *(
+                self._refresh(host, device, result)
+                for host, device in self._devices.items()
+            )
+        )
+        result.duration = time.monotonic() - start
+        self.last_result = result
+        return result
+
+    async def close(self) -> None:
+        """Close the sessions opened by the devices."""
+        await asyncio.gather(*(device.close() for device in self._devices.values()))
+
+    async def __aenter__(self) -> "MyStromFleet":
+        """Async enter."""
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Async exit."""
+        await self.close()
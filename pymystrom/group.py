@@ -0,0 +1,205 @@
+"""Support for controlling groups of myStrom devices at once."""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Union,
+)
+
+from .bulb import MyStromBulb
+from .exceptions import MyStromConnectionError, MyStromError
+from .fleet import DEVICE_TIMEOUT, MAX_CONCURRENCY, Device, refresh_device
+from .switch import MyStromSwitch
+
+_LOGGER = logging.getLogger(__name__)
+
+Command = Callable[[Device], Awaitable[Any]]
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceOutcome:
+    """Outcome of a command for a single device, ``latency`` is in seconds."""
+
+    host: str
+    latency: float
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """Return True if the command succeeded."""
+        return self.error is None
+
+
+@dataclass
+class GroupResult:
+    """Outcome of a command for a group of devices."""
+
+    outcomes: Dict[str, DeviceOutcome] = field(default_factory=dict)
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        """Return True if the command succeeded for every device."""
+        return all(outcome.ok for outcome in self.outcomes.values())
+
+    @property
+    def failed(self) -> List[str]:
+        """Return the hosts for which the command failed."""
+        return [host for host, outcome in self.outcomes.items() if not outcome.ok]
+
+
+async def _switch_on(device: Device) -> None:
+    """Turn a switch or bulb on."""
+    if isinstance(device, MyStromSwitch):
+        await device.turn_on(refresh=False)
+    else:
+        await device.set_on()
+
+
+async def _switch_off(device: Device) -> None:
+    """Turn a switch or bulb off."""
+    if isinstance(device, MyStromSwitch):
+        await device.turn_off(refresh=False)
+    else:
+        await device.set_off()
+
+
+def _is_on(device: Device) -> Optional[bool]:
+    """Return the known state of a switch or bulb."""
+    if isinstance(device, MyStromSwitch):
+        return device.relay
+    if isinstance(device, MyStromBulb):
+        return device.state
+    return None
+
+
+class Group:
+    """A class for a group of switches and bulbs that are controlled together.
+
+    Commands are sent to all devices concurrently with a shared deadline, so
+    the time to apply a scene depends on the slowest device and not on the
+    number of devices. The state is not read back, use ``verify()`` for one
+    concurrent check of all devices instead.
+    """
+
+    def __init__(
+        self,
+        devices: Iterable[Device],
+        deadline: float = DEVICE_TIMEOUT,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ) -> None:
+        """Initialize the group, ``deadline`` is in seconds for all devices."""
+        self.deadline = deadline
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._devices: Dict[str, Device] = {}
+        for device in devices:
+            self.add(device)
+
+    def add(self, device: Device) -> None:
+        """Add a device to the group."""
+        self._devices[device._host] = device
+
+    @property
+    def devices(self) -> List[Device]:
+        """Return all devices of the group."""
+        return list(self._devices.values())
+
+    async def _run(
+        self, host: str, device: Device, command: Command, expires: float
+    ) -> DeviceOutcome:
+        """Run a command for a device until the deadline."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            async with self._semaphore:
+                await asyncio.wait_for(command(device), max(0, expires - loop.time()))
+        except asyncio.TimeoutError:
+            error = MyStromConnectionError("Deadline exceeded for myStrom device.")
+        except Exception as exception:
+            _LOGGER.debug("Command for %s failed: %s", host, exception)
+            error = exception
+        else:
+            error = None
+        return DeviceOutcome(host, time.perf_counter() - start, error)
+
+    async def run(
+        self,
+        command: Union[Command, Mapping[str, Command]],
+        deadline: Optional[float] = None,
+    ) -> GroupResult:
+        """Run the same command for all devices or a command per host.
+
+        Devices without a command in the mapping are skipped. Errors are
+        reported per host instead of being raised.
+        """
+        if callable(command):
+            commands = {host: command for host in self._devices}
+        else:
+            commands = {
+                host: command[host] for host in self._devices if host in command
+            }
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + (self.deadline if deadline is None else deadline)
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(
+                self._run(host, self._devices[host], host_command, expires)
+                for host, host_command in commands.items()
+            )
+        )
+        return GroupResult(
+            {outcome.host: outcome for outcome in outcomes},
+            time.perf_counter() - start,
+        )
+
+    async def turn_on(self, deadline: Optional[float] = None) -> GroupResult:
+        """Turn all switches and bulbs on."""
+        return await self.run(_switch_on, deadline)
+
+    async def turn_off(self, deadline: Optional[float] = None) -> GroupResult:
+        """Turn all switches and bulbs off."""
+        return await self.run(_switch_off, deadline)
+
+    async def set_color_hex(
+        self, value: str, deadline: Optional[float] = None
+    ) -> GroupResult:
+        """Set the color of all bulbs."""
+        return await self.run(
+            {
+                host: (lambda device: device.set_color_hex(value))
+                for host, device in self._devices.items()
+                if isinstance(device, MyStromBulb)
+            },
+            deadline,
+        )
+
+    async def apply(
+        self, scene: Mapping[str, Command], deadline: Optional[float] = None
+    ) -> GroupResult:
+        """Apply a scene, a command per host."""
+        return await self.run(scene, deadline)
+
+    async def verify(
+        self, on: Optional[bool] = None, deadline: Optional[float] = None
+    ) -> GroupResult:
+        """Read back the state of all devices concurrently.
+
+        If ``on`` is given, devices in another state are reported as failed.
+        """
+
+        async def _verify(device: Device) -> None:
+            await refresh_device(device)
+            if on is not None and _is_on(device) is not None and _is_on(device) != on:
+                raise MyStromError(f"{device._host} is not {'on' if on else 'off'}")
+
+        return await self.run(_verify, deadline)
@@ -0,0 +1,291 @@
+"""Instrumentation of the requests sent to myStrom devices."""
+
+import bisect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+from yarl import URL
+
+_LOGGER = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass(frozen=True, slots=True)
+class RequestEvent:
+    """Representation of a finished request to a device.
+
+    Timings are in seconds, ``dns`` and ``connect`` are None if a cached
+    lookup or a pooled connection was used.
+    """
+
+    host: str
+    endpoint: str
+    method: str
+    status: Optional[int]
+    bytes: int
+    total: float
+    dns: Optional[float] = None
+    connect: Optional[float] = None
+    ttfb: Optional[float] = None
+    error: Optional[str] = None
+
+
+RequestObserver = Callable[[RequestEvent], None]
+
+_OBSERVERS: List[RequestObserver] = []
+
+
+def add_observer(observer: RequestObserver) -> Callable[[], None]:
+    """Add an observer for request events, returns a function to remove it."""
+    _OBSERVERS.append(observer)
+    return lambda: remove_observer(observer)
+
+
+def remove_observer(observer: RequestObserver) -> None:
+    """Remove an observer for request events."""
+    try:
+        _OBSERVERS.remove(observer)
+    except ValueError:
+        pass
+
+
+def has_observers() -> bool:
+    """Return True if any observer is registered."""
+    return bool(_OBSERVERS)
+
+
+class RequestTrace:
+    """Collect the details of a single request.
+
+    Passed as ``trace_request_ctx`` to aiohttp, so the callbacks of the trace
+    config created by ``create_trace_config()`` can fill in the timings.
+    """
+
+    __slots__ = (
+        "url",
+        "method",
+        "status",
+        "bytes",
+        "error",
+        "start",
+        "dns_start",
+        "dns",
+        "connect_start",
+        "connect",
+        "ttfb",
+    )
+
+    def __init__(self, url: URL, method: str) -> None:
+        """Initialize the trace."""
+        self.url = url
+        self.method = method
+        self.status: Optional[int] = None
+        self.bytes = 0
+        self.error: Optional[str] = None
+        self.start = time.perf_counter()
+        self.dns_start: Optional[float] = None
+        self.dns: Optional[float] = None
+        self.connect_start: Optional[float] = None
+        self.connect: Optional[float] = None
+        self.ttfb: Optional[float] = None
+
+    def finish(self) -> None:
+        """Create the event and pass it to all observers."""
+        event = RequestEvent(
+            host=self.url.host,
+            endpoint=self.url.path,
+            method=self.method,
+            status=self.status,
+            bytes=self.bytes,
+            total=time.perf_counter() - self.start,
+            dns=self.dns,
+            connect=self.connect,
+            ttfb=self.ttfb,
+            error=self.error,
+        )
+        for observer in list(_OBSERVERS):
+            try:
+                observer(event)
+            except Exception:
+                _LOGGER.exception("Error in request observer %s", observer)
+
+
+def _trace(context) -> Optional[RequestTrace]:
+    """Return the request trace of a trace config context."""
+    trace = context.trace_request_ctx
+    return trace if isinstance(trace, RequestTrace) else None
+
+
+async def _on_dns_resolvehost_start(session, context, params) -> None:
+    """Record the start of a DNS lookup."""
+    if trace := _trace(context):
+        trace.dns_start = time.perf_counter()
+
+
+async def _on_dns_resolvehost_end(session, context, params) -> None:
+    """Record the duration of a DNS lookup."""
+    if (trace := _trace(context)) and trace.dns_start is not None:
+        trace.dns = time.perf_counter() - trace.dns_start
+
+
+async def _on_connection_create_start(session, context, params) -> None:
+    """Record the start of a new connection."""
+    if trace := _trace(context):
+        trace.connect_start = time.perf_counter()
+
+
+async def _on_connection_create_end(session, context, params) -> None:
+    """Record the time to establish a new connection."""
+    if (trace := _trace(context)) and trace.connect_start is not None:
+        trace.connect = time.perf_counter() - trace.connect_start
+
+
+async def _on_request_end(session, context, params) -> None:
+    """Record the time until the response headers were received."""
+    if trace := _trace(context):
+        trace.ttfb = time.perf_counter() - trace.start
+
+
+def create_trace_config() -> aiohttp.TraceConfig:
+    """Create a trace config that records DNS, connect and TTFB timings."""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_dns_resolvehost_start.append(_on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(_on_dns_resolvehost_end)
+    trace_config.on_connection_create_start.append(_on_connection_create_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    trace_config.on_request_end.append(_on_request_end)
+    return trace_config
+
+
+@dataclass
+class Histogram:
+    """A latency histogram with fixed buckets."""
+
+    counts: List[int] = field(default_factory=lambda: [0] * (len(BUCKETS) + 1))
+    count: int = 0
+    sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add a value to the histogram."""
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram") -> None:
+        """Add the values of another histogram."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+
+@dataclass
+class EndpointStatistics:
+    """Statistics of the requests to one endpoint of a host."""
+
+    latency: Histogram = field(default_factory=Histogram)
+    bytes: int = 0
+    errors: Dict[str, int] = field(default_factory=dict)
+
+
+class RequestStatistics:
+    """An observer that aggregates the request events in memory."""
+
+    def __init__(self) -> None:
+        """Initialize the statistics."""
+        self._statistics: Dict[Tuple[str, str], EndpointStatistics] = {}
+
+    def __call__(self, event: RequestEvent) -> None:
+        """Add a request event."""
+        key = (event.host, event.endpoint)
+        statistics = self._statistics.get(key)
+        if statistics is None:
+            statistics = self._statistics[key] = EndpointStatistics()
+        statistics.latency.observe(event.total)
+        statistics.bytes += event.bytes
+        if event.error is not None:
+            statistics.errors[event.error] = statistics.errors.get(event.error, 0) + 1
+
+    @property
+    def endpoints(self) -> Dict[Tuple[str, str], EndpointStatistics]:
+        """Return the statistics per host and endpoint."""
+        return self._statistics
+
+    def by_host(self) -> Dict[str, Histogram]:
+        """Return the latency histogram per host."""
+        hosts: Dict[str, Histogram] = {}
+        for (host, _), statistics in self._statistics.items():
+            hosts.setdefault(host, Histogram()).merge(statistics.latency)
+        return hosts
+
+    def slowest_hosts(self, share: float = 0.8) -> List[Tuple[str, float]]:
+        """Return the hosts that account for the given share of the latency."""
+        totals = sorted(
+            ((host, histogram.sum) for host, histogram in self.by_host().items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        limit = sum(total for _, total in totals) * share
+        result = []
+        accumulated = 0.0
+        for host, total in totals:
+            if accumulated >= limit:
+                break
+            result.append((host, total))
+            accumulated += total
+        return result
+
+    def reset(self) -> None:
+        """Drop all statistics."""
+        self._statistics.clear()
+
+
+def _labels(**labels: str) -> str:
+    """Format Prometheus labels."""
+    escaped = (
+        '{}="{}"'.format(
+            key,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def prometheus_text(statistics: RequestStatistics, prefix: str = "mystrom") -> str:
+    """Export the statistics in the Prometheus text format."""
+    name = f"{prefix}_request_duration_seconds"
+    lines = [
+        f"# HELP {name} Duration of requests to myStrom devices.",
+        f"# TYPE {name} histogram",
+    ]
+    bytes_lines = [
+        f"# HELP {prefix}_response_bytes_total Bytes received from myStrom devices.",
+        f"# TYPE {prefix}_response_bytes_total counter",
+    ]
+    error_lines = [
+        f"# HELP {prefix}_request_errors_total Failed requests to myStrom devices.",
+        f"# TYPE {prefix}_request_errors_total counter",
+    ]
+    for (host, endpoint), endpoint_statistics in sorted(statistics.endpoints.items()):
+        histogram = endpoint_statistics.latency
+        cumulative = 0
+        for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            labels = _labels(host=host, endpoint=endpoint, le=le)
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _labels(host=host, endpoint=endpoint)
+        lines.append(f"{name}_sum{labels} {histogram.sum}")
+        lines.append(f"{name}_count{labels} {histogram.count}")
+        bytes_lines.append(
+            f"{prefix}_response_bytes_total{labels} {endpoint_statistics.bytes}"
+        )
+        for error, count in sorted(endpoint_statistics.errors.items()):
+            labels = _labels(host=host, endpoint=endpoint, error=error)
+            error_lines.append(f"{prefix}_request_errors_total{labels} {count}")
+    return "\n".join(lines + bytes_lines + error_lines) + "\n"
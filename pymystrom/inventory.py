@@ -0,0 +1,321 @@
+"""Support for a persistent inventory of myStrom devices."""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+import aiohttp
+
+from . import MyStromDevice
+from .capabilities import CAPABILITIES, CapabilityRegistry, write_json_atomic
+from .discovery import EVENT_EXPIRED, DiscoveredDevice, DiscoveryEvent, normalize_mac
+from .exceptions import MyStromConnectionError
+from .factory import create_device
+from .fleet import Device, MyStromFleet
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds after which an entry is confirmed again with the device info
+REVALIDATE_AFTER = 24 * 3600
+REVALIDATE_CONCURRENCY = 8
+REVALIDATE_TIMEOUT = aiohttp.ClientTimeout(total=5, sock_connect=1)
+# Seconds to collect the changes of discovery events before writing the file
+SAVE_DELAY = 5.0
+
+
+@dataclass
+class InventoryEntry:
+    """Representation of a known device, ``validated`` is a Unix timestamp."""
+
+    mac: str
+    host: str
+    type: Union[int, str, None] = None
+    firmware: Optional[str] = None
+    api_version: Optional[int] = None
+    validated: float = 0.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "InventoryEntry":
+        """Create the entry from a stored record."""
+        return cls(
+            mac=normalize_mac(data["mac"]),
+            host=data["host"],
+            type=data.get("type"),
+            firmware=data.get("firmware"),
+            api_version=data.get("api_version"),
+            validated=data.get("validated", 0.0),
+        )
+
+
+class DeviceInventory:
+    """Representation of the known devices keyed by MAC address.
+
+    The inventory is loaded at startup, so device objects can be created
+    without waiting for the discovery or fetching the device info of every
+    host. Entries are confirmed again in the background, see ``revalidate()``.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        revalidate_after: float = REVALIDATE_AFTER,
+        capabilities: CapabilityRegistry = CAPABILITIES,
+        save_delay: float = SAVE_DELAY,
+    ):
+        """Initialize the inventory, optionally backed by a JSON file."""
+        self.path = path
+        self.revalidate_after = revalidate_after
+        self.capabilities = capabilities
+        self.save_delay = save_delay
+        self._entries: Dict[str, InventoryEntry] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._save_now = asyncio.Event()
+        self._save_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        """Return the number of known devices."""
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[InventoryEntry]:
+        """Iterate over the known devices."""
+        return iter(list(self._entries.values()))
+
+    def get(self, mac: str) -> Optional[InventoryEntry]:
+        """Get the entry of a MAC address."""
+        return self._entries.get(normalize_mac(mac))
+
+    def remove(self, mac: str) -> None:
+        """Drop the entry of a MAC address."""
+        self._entries.pop(normalize_mac(mac), None)
+
+    def update(self, mac: str, host: str, **fields) -> bool:
+        """Add or update an entry, returns True if anything changed.
+
+        Fields which are None do not overwrite known values.
+        """
+        mac = normalize_mac(mac)
+        entry = self._entries.get(mac)
+        if entry is None:
+            entry = self._entries[mac] = InventoryEntry(mac, host)
+            changed = True
+        else:
+            changed = entry.host != host
+            if changed:
+                # The address was reassigned, the device must be confirmed again
+                self.capabilities.forget(entry.host)
+                entry.host = host
+                entry.validated = 0.0
+        for name, value in fields.items():
+            if value is not None and getattr(entry, name) != value:
+                setattr(entry, name, value)
+                changed = True
+        if entry.api_version is not None:
+            self.capabilities.get(host).api_version = entry.api_version
+        return changed
+
+    def update_from_discovered(self, device: DiscoveredDevice) -> bool:
+        """Add or update an entry from a discovered device."""
+        return self.update(device.mac, device.host, type=device.type)
+
+    def update_from_info(self, host: str, info: dict) -> bool:
+        """Add or update an entry from the device info of a host."""
+        return self.update(
+            info["mac"],
+            host,
+            type=info.get("type"),
+            firmware=info.get("version"),
+            api_version=self.capabilities.get(host).api_version,
+            validated=time.time(),
+        )
+
+    def seed_capabilities(self) -> None:
+        """Record the known API generations, so the probing is skipped."""
+        for entry in self._entries.values():
+            if entry.api_version is not None:
+                self.capabilities.get(entry.host).api_version = entry.api_version
+
+    def load(self, path: Optional[str] = None) -> None:
+        """Load the entries from disk and seed the capabilities."""
+        path = path or self.path
+        if path is None:
+            return
+        try:
+            with open(path, encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exception:
+            _LOGGER.warning("Unable to load inventory from %s: %s", path, exception)
+            return
+        for record in data:
+            entry = InventoryEntry.from_dict(record)
+            self._entries[entry.mac] = entry
+        self.seed_capabilities()
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Write the entries to disk atomically."""
+        path = path or self.path
+        if path is None:
+            return
+        self._dirty = False
+        write_json_atomic(path, self._records())
+
+    def _records(self) -> List[Dict[str, Any]]:
+        """Return the entries as JSON records."""
+        return [asdict(entry) for entry in self._entries.values()]
+
+    def _schedule_save(self) -> None:
+        """Save the changes after ``save_delay`` seconds."""
+        if self.path is None:
+            return
+        self._dirty = True
+        if self._save_task is None or self._save_task.done():
+            self._save_now.clear()
+            self._save_task = asyncio.get_running_loop().create_task(
+                self._delayed_save()
+            )
+
+    async def _write(self) -> None:
+        """Write the entries in a thread, off the event loop."""
+        self._dirty = False
+        try:
+            await asyncio.to_thread(write_json_atomic, self.path, self._records())
+        except OSError as exception:
+            _LOGGER.warning("Unable to save inventory: %s", exception)
+
+    async def _delayed_save(self) -> None:
+        """Write the collected changes after ``save_delay`` seconds."""
+        try:
+            await asyncio.wait_for(self._save_now.wait(), self.save_delay)
+        except asyncio.TimeoutError:
+            pass
+        while self._dirty:
+            await self._write()
+
+    async def flush(self) -> None:
+        """Write pending changes of discovery events now."""
+        if self._save_task is not None and not self._save_task.done():
+            self._save_now.set()
+            await self._save_task
+        elif self._dirty and self.path is not None:
+            await self._write()
+
+    async def save_async(self) -> None:
+        """Write the entries to disk without blocking the event loop."""
+        if self.path is not None:
+            self._dirty = True
+            await self.flush()
+
+    def attach(self, service) -> Callable[[], None]:
+        """Keep the inventory up to date from the events of a discovery service.
+
+        Returns a function to detach the inventory again.
+        """
+        return service.subscribe(self.handle_event)
+
+    def handle_event(self, event: DiscoveryEvent) -> None:
+        """Record a discovery event, expired devices are kept.
+
+        The changes are saved together after ``save_delay`` seconds, use
+        ``flush()`` to save them earlier.
+        """
+        if event.type == EVENT_EXPIRED:
+            return
+        if self.update_from_discovered(event.device):
+            self._schedule_save()
+
+    def create_devices(
+        self, session: aiohttp.client.ClientSession = None, token: Optional[str] = None
+    ) -> List[Device]:
+        """Create the device objects of all known and supported devices."""
+        devices = []
+        for entry in self._entries.values():
+            device = create_device(
+                entry.host, entry.type, entry.mac, session=session, token=token
+            )
+            if device is not None:
+                devices.append(device)
+        return devices
+
+    def create_fleet(
+        self,
+        session: aiohttp.client.ClientSession = None,
+        token: Optional[str] = None,
+        **kwargs,
+    ) -> MyStromFleet:
+        """Create a fleet of all known and supported devices."""
+        return MyStromFleet(
+            self.create_devices(session, token), session=session, token=token, **kwargs
+        )
+
+    def stale(self) -> List[InventoryEntry]:
+        """Return the entries which should be confirmed again."""
+        limit = time.time() - self.revalidate_after
+        return [entry for entry in self._entries.values() if entry.validated < limit]
+
+    async def _validate(
+        self,
+        entry: InventoryEntry,
+        session: aiohttp.client.ClientSession,
+        token: Optional[str],
+    ) -> bool:
+        """Fetch the device info of an entry, returns True if anything changed."""
+        device = MyStromDevice(entry.host, session, timeout=REVALIDATE_TIMEOUT)
+        try:
+            info = await device.get_device_info(token)
+        except (MyStromConnectionError, asyncio.TimeoutError) as exception:
+            # Keep the entry, the device may only be switched off
+            _LOGGER.debug("Unable to revalidate %s: %s", entry.host, exception)
+            return False
+        if not isinstance(info, dict) or "mac" not in info:
+            return False
+        if normalize_mac(info["mac"]) != entry.mac:
+            # The address was reassigned, the discovery will find the device again
+            _LOGGER.debug("Host %s now belongs to %s", entry.host, info["mac"])
+            self.remove(entry.mac)
+        self.update_from_info(entry.host, info)
+        return True
+
+    async def revalidate(
+        self,
+        session: aiohttp.client.ClientSession = None,
+        token: Optional[str] = None,
+        concurrency: int = REVALIDATE_CONCURRENCY,
+    ) -> int:
+        """Confirm the stale entries and save the changes, returns their number."""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _run(entry: InventoryEntry) -> bool:
+            async with semaphore:
+                return await self._validate(entry, session, token)
+
+        results = await asyncio.gather(*(_run(entry) for entry in self.stale()))
+        changed = sum(results)
+        if changed:
+            await self.save_async()
+        return changed
+
+    def start_revalidation(
+        self, session: aiohttp.client.ClientSession = None, token: Optional[str] = None
+    ) -> asyncio.Task:
+        """Revalidate the stale entries in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(
+                self.revalidate(session, token)
+            )
+        return self._task
+
+    async def close(self) -> None:
+        """Stop a running revalidation and save pending changes."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,215 @@
+"""Support for following the motion detected by myStrom PIRs."""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from .pir import MyStromPir
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds between two polls while motion is (possibly) active and while idle
+ACTIVE_INTERVAL = 0.5
+IDLE_INTERVAL = 5.0
+# Seconds a new motion state must last before an edge is reported
+DEBOUNCE = 1.0
+POLL_TIMEOUT = 5.0
+
+
+@dataclass(frozen=True, slots=True)
+class MotionEvent:
+    """Representation of a motion edge, ``timestamp`` is a Unix timestamp."""
+
+    pir: MyStromPir
+    motion: bool
+    timestamp: float
+
+
+class MotionWatcher:
+    """Detect the debounced motion edges of a PIR for a single consumer."""
+
+    __slots__ = ("queue", "debounce", "state", "candidate", "since", "since_time")
+
+    def __init__(self, debounce: float) -> None:
+        """Initialize the watcher."""
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.debounce = debounce
+        self.state: Optional[bool] = None
+        self.candidate: Optional[bool] = None
+        self.since = 0.0
+        self.since_time = 0.0
+
+    @property
+    def active(self) -> bool:
+        """Return True if motion is active or an edge is being confirmed."""
+        return bool(self.state) or self.candidate is not None
+
+    def observe(self, pir: MyStromPir, motion: bool, now: float) -> None:
+        """Process a polled motion state, ``now`` is a monotonic timestamp."""
+        if self.state is None:
+            # The first poll only sets the initial state
+            self.state = motion
+            return
+        if motion == self.state:
+            self.candidate = None
+            return
+        if self.candidate != motion:
+            self.candidate = motion
+            self.since = now
+            self.since_time = time.time()
+        if now - self.since >= self.debounce:
+            self.state = motion
+            self.candidate = None
+            self.queue.put_nowait(MotionEvent(pir, motion, self.since_time))
+
+
+class WatchedPir:
+    """Representation of a polled PIR and its watchers."""
+
+    __slots__ = ("pir", "watchers", "due", "errors", "polling")
+
+    def __init__(self, pir: MyStromPir) -> None:
+        """Initialize the polling state."""
+        self.pir = pir
+        self.watchers: List[MotionWatcher] = []
+        self.due = 0.0
+        self.errors = 0
+        self.polling = False
+
+
+class MotionMonitor:
+    """A single task that polls the motion of many PIRs.
+
+    Each PIR is polled every ``active_interval`` seconds while motion is
+    active or an edge is being confirmed, otherwise every ``idle_interval``
+    seconds. The task only runs while PIRs are watched.
+    """
+
+    def __init__(
+        self,
+        active_interval: float = ACTIVE_INTERVAL,
+        idle_interval: float = IDLE_INTERVAL,
+        timeout: float = POLL_TIMEOUT,
+    ) -> None:
+        """Initialize the monitor."""
+        self.active_interval = active_interval
+        self.idle_interval = idle_interval
+        self.timeout = timeout
+        self._watched: Dict[int, WatchedPir] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._polls: Set[asyncio.Task] = set()
+
+    @property
+    def pirs(self) -> List[MyStromPir]:
+        """Return the watched PIRs."""
+        return [watched.pir for watched in self._watched.values()]
+
+    def interval(self, pir: MyStromPir) -> Optional[float]:
+        """Return the current poll interval of a PIR."""
+        watched = self._watched.get(id(pir))
+        return self._interval(watched) if watched is not None else None
+
+    def _interval(self, watched: WatchedPir) -> float:
+        """Return the poll interval based on the state of the watchers."""
+        if any(watcher.active for watcher in watched.watchers):
+            return self.active_interval
+        return self.idle_interval
+
+    def _add(self, pir: MyStromPir, watcher: MotionWatcher) -> None:
+        """Start polling a PIR for a watcher."""
+        watched = self._watched.get(id(pir))
+        if watched is None:
+            watched = self._watched[id(pir)] = WatchedPir(pir)
+        watched.watchers.append(watcher)
+        watched.due = time.monotonic()
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._wakeup.set()
+
+    def _remove(self, pir: MyStromPir, watcher: MotionWatcher) -> None:
+        """Stop polling a PIR for a watcher."""
+        watched = self._watched.get(id(pir))
+        if watched is None:
+            return
+        watched.watchers.remove(watcher)
+        if not watched.watchers:
+            del self._watched[id(pir)]
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def watch(
+        self, pir: MyStromPir, debounce: Optional[float] = None
+    ) -> AsyncIterator[MotionEvent]:
+        """Iterate over the motion edges of a PIR."""
+        watcher = MotionWatcher(DEBOUNCE if debounce is None else debounce)
+        self._add(pir, watcher)
+        try:
+            while True:
+                yield await watcher.queue.get()
+        finally:
+            self._remove(pir, watcher)
+
+    async def _poll(self, watched: WatchedPir) -> None:
+        """Poll the motion of a PIR and pass it to the watchers."""
+        try:
+            await asyncio.wait_for(watched.pir.refresh(("motion",)), self.timeout)
+        except Exception as exception:
+            _LOGGER.debug("Polling %s failed: %s", watched.pir._host, exception)
+            watched.errors += 1
+            watched.due = time.monotonic() + self.idle_interval
+        else:
+            now = time.monotonic()
+            for watcher in list(watched.watchers):
+                watcher.observe(watched.pir, bool(watched.pir.motion), now)
+            watched.due = now + self._interval(watched)
+        watched.polling = False
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        """Start the polls of the due PIRs until no PIR is watched anymore.
+
+        Every poll runs in its own task, so a slow PIR does not delay the
+        others. A PIR is not polled again while its previous poll is running.
+        """
+        loop = asyncio.get_running_loop()
+        while self._watched:
+            now = time.monotonic()
+            waiting = []
+            for watched in self._watched.values():
+                if watched.polling:
+                    continue
+                if watched.due <= now:
+                    watched.polling = True
+                    task = loop.create_task(self._poll(watched))
+                    self._polls.add(task)
+                    task.add_done_callback(self._polls.discard)
+                else:
+                    waiting.append(watched.due)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), min(waiting) - now if waiting else None
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def close(self) -> None:
+        """Stop polling and wait for the running polls."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._polls):
+            task.cancel()
+        await asyncio.gather(*self._polls, return_exceptions=True)
+
+
+MOTION_MONITOR = MotionMonitor()
@@ -1,14 +1,34 @@
 """Support for communicating with myStrom PIRs."""
 
-from typing import Optional
+import asyncio
+from typing import AsyncIterator, Iterable, Optional
 
 import aiohttp
 from yarl import URL
 
 from . import _request as request
+from .capabilities import CAPABILITIES, DeviceCapabilities
 
 URI_PIR = URL("api/v1/")
 
+# Methods to fetch the properties of a PIR
+REFRESH_METHODS = {
+    "sensors": "get_sensors_state",
+    "motion": "get_motion",
+    "temperature_measured": "get_temperatures",
+    "temperature_compensated": "get_temperatures",
+    "temperature_compensation": "get_temperatures",
+    "temperature_raw": "get_temperatures",
+    "intensity": "get_light",
+    "day": "get_light",
+    "light_raw": "get_light",
+    "settings": "get_settings",
+    "pir": "get_pir",
+    "actions": "get_actions",
+}
+# Methods which are not needed if ``/api/v1/sensors`` is fetched anyway
+COVERED_BY_SENSORS = ("get_motion",)
+
 
 class MyStromPir:
     """A class for a myStrom PIR."""
@@ -18,12 +38,14 @@ class MyStromPir:
         host: str,
         session: aiohttp.client.ClientSession = None,
         token: Optional[str] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
     ) -> None:
         """Initialize the switch."""
         self._close_session = False
         self._host = host
         self._token = token
         self._session = session
+        self._timeout = timeout
         self._intensity = None
         self._day = None
         self._light_raw = None
@@ -67,12 +89,14 @@ class MyStromPir:
             "light": response["light"],
             "temperature": round(response["temperature"], 2),
         }
+        self._motion = response["motion"]
 
     async def get_temperatures(self) -> None:
         """Get the temperatures from the PIR."""
         # There is a different URL for the temp endpoint
         url = URL.build(scheme="http", host=self._host) / "temp"
         response = await request(self, uri=url, token=self._token)
+        self.capabilities.set_supported("temp", True)
         self._temperature_raw = response
         self._temperature_measured = round(response["measured"], 2)
         self._temperature_compensated = round(response["compensated"], 2)
@@ -92,6 +116,43 @@ class MyStromPir:
         self._day = response["day"]
         self._light_raw = response["raw"]
 
+    async def refresh(self, fields: Optional[Iterable[str]] = None) -> None:
+        """Fetch the given properties (all if None) at once.
+
+        Every endpoint is requested once, even if it provides several of the
+        fields, e.g. ``motion`` is taken from the sensors if they are fetched.
+        The shared session only opens ``LIMIT_PER_HOST`` (2) connections to a
+        PIR, so a full refresh of 6 endpoints takes 3 round trips. Raise the
+        limit with ``configure_session(limit_per_host=...)`` if the PIR copes
+        with more connections.
+        """
+        fields = list(REFRESH_METHODS if fields is None else fields)
+        unknown = [field for field in fields if field not in REFRESH_METHODS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        methods = dict.fromkeys(REFRESH_METHODS[field] for field in fields)
+        if "get_sensors_state" in methods:
+            for method in COVERED_BY_SENSORS:
+                methods.pop(method, None)
+        await asyncio.gather(*(getattr(self, method)() for method in methods))
+
+    def motion_events(
+        self, debounce: Optional[float] = None, monitor=None
+    ) -> AsyncIterator:
+        """Iterate over the motion edges (start and stop) with timestamps.
+
+        A new state is only reported after it lasted ``debounce`` seconds.
+        The PIR is polled by a ``MotionMonitor`` shared with other PIRs.
+        """
+        from .motion import MOTION_MONITOR
+
+        return (monitor or MOTION_MONITOR).watch(self, debounce)
+
+    @property
+    def capabilities(self) -> DeviceCapabilities:
+        """Return the detected capabilities of the PIR."""
+        return CAPABILITIES.get(self._host)
+
     @property
     def settings(self) -> Optional[dict]:
         """Return current settings."""
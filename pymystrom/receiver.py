@@ -0,0 +1,226 @@
+"""Support for receiving the action callbacks of myStrom devices."""
+
+import asyncio
+import dataclasses
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional, Union
+
+from aiohttp import web
+from yarl import URL
+
+from . import _request as request
+from .discovery import normalize_mac
+from .pir import MyStromPir
+from .switch import MyStromSwitch
+
+_LOGGER = logging.getLogger(__name__)
+
+RECEIVER_PORT = 8321
+RECEIVER_PATH = "/api/mystrom"
+
+# Events and the action endpoints (relative to ``/api/v1/action/``) to set them
+PIR_ACTIONS = {"motion": "pir/generic", "no_motion": "pir/no_motion"}
+SWITCH_ACTIONS = {"on": "relay/on", "off": "relay/off"}
+# Query parameters of the URLs written by ``mystrom button home-assistant``
+BUTTON_ACTIONS = ("single", "double", "long", "touch")
+
+Receivable = Union[MyStromSwitch, MyStromPir]
+
+
+@dataclass(frozen=True, slots=True)
+class ActionEvent:
+    """Representation of a received action callback.
+
+    ``device`` is None if the sender is not known to the receiver, e.g. a
+    button configured with ``mystrom button home-assistant``.
+    """
+
+    action: str
+    host: str
+    mac: Optional[str] = None
+    device: Optional[Receivable] = None
+    received: float = 0.0
+
+
+def apply_action(device: Receivable, action: str) -> bool:
+    """Update the state of a device from an action, returns True if it changed."""
+    if isinstance(device, MyStromSwitch) and action in SWITCH_ACTIONS:
+        relay = action == "on"
+        if device._report.relay == relay:
+            return False
+        device._report = dataclasses.replace(device._report, relay=relay)
+        return True
+    if isinstance(device, MyStromPir) and action in PIR_ACTIONS:
+        motion = action == "motion"
+        if device._sensors is not None:
+            device._sensors = dict(device._sensors, motion=motion)
+        if device._motion == motion:
+            return False
+        device._motion = motion
+        return True
+    return False
+
+
+class ActionReceiver:
+    """A HTTP endpoint for the action URLs of myStrom devices.
+
+    The devices call ``get://<address>:<port><path>?mac=<mac>&action=<event>``,
+    the matching device objects are updated and the event is passed to all
+    subscribers. Polling can then be reduced to a slow reconciliation.
+
+    Use ``start()`` to listen on an own port or ``add_routes()`` to embed the
+    receiver into an existing ``aiohttp.web.Application``.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        port: int = RECEIVER_PORT,
+        path: str = RECEIVER_PATH,
+        listen_host: str = "0.0.0.0",
+    ) -> None:
+        """Initialize the receiver, ``address`` must be reachable by the devices."""
+        self.address = address
+        self.port = port
+        self.path = path
+        self.listen_host = listen_host
+        self.received = 0
+        self._devices_by_mac: Dict[str, Receivable] = {}
+        self._devices_by_host: Dict[str, Receivable] = {}
+        self._subscribers: List[Callable[[ActionEvent], None]] = []
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def running(self) -> bool:
+        """Return True if the receiver listens on an own port."""
+        return self._runner is not None
+
+    def action_url(self, action: str, mac: Optional[str] = None) -> str:
+        """Return the action URL for an event of a device."""
+        query = f"action={action}"
+        if mac is not None:
+            query = f"mac={normalize_mac(mac)}&{query}"
+        return f"get://{self.address}:{self.port}{self.path}?{query}"
+
+    def add(self, device: Receivable, mac: Optional[str] = None) -> None:
+        """Add a device which is updated by its callbacks."""
+        mac = mac or getattr(device, "mac", None)
+        if mac is not None:
+            self._devices_by_mac[normalize_mac(mac)] = device
+        self._devices_by_host[device._host] = device
+
+    def remove(self, device: Receivable) -> None:
+        """Remove a device."""
+        for devices in (self._devices_by_mac, self._devices_by_host):
+            for key in [key for key, value in devices.items() if value is device]:
+                del devices[key]
+
+    async def register(self, device: Receivable, mac: Optional[str] = None) -> None:
+        """Add a device and set the receiver as the target of its actions."""
+        self.add(device, mac)
+        mac = mac or getattr(device, "mac", None)
+        actions = PIR_ACTIONS if isinstance(device, MyStromPir) else SWITCH_ACTIONS
+        base = URL.build(scheme="http", host=device._host) / "api" / "v1" / "action"
+        for action, endpoint in actions.items():
+            await request(
+                device,
+                uri=base / endpoint,
+                method="POST",
+                data=self.action_url(action, mac),
+                token=device._token,
+            )
+
+    def subscribe(self, callback: Callable[[ActionEvent], None]) -> Callable[[], None]:
+        """Subscribe to action events, returns a function to unsubscribe."""
+        self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            """Remove the subscription."""
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _publish(self, event: ActionEvent) -> None:
+        """Pass an event to all subscribers."""
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception:
+                _LOGGER.exception("Error in action subscriber %s", callback)
+
+    async def events(self) -> AsyncIterator[ActionEvent]:
+        """Iterate over the action events as they occur."""
+        queue: asyncio.Queue = asyncio.Queue()
+        unsubscribe = self.subscribe(queue.put_nowait)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            unsubscribe()
+
+    def __aiter__(self) -> AsyncIterator[ActionEvent]:
+        """Iterate over the action events as they occur."""
+        return self.events()
+
+    def handle(self, host: str, query) -> Optional[ActionEvent]:
+        """Process the query of a callback, returns None if it is not valid."""
+        mac = query.get("mac")
+        action = query.get("action")
+        if action is None:
+            # A button configured with ``mystrom button home-assistant``
+            action = next((name for name in BUTTON_ACTIONS if name in query), None)
+            if action is None:
+                return None
+        if mac is not None:
+            mac = normalize_mac(mac)
+            device = self._devices_by_mac.get(mac)
+        else:
+            device = self._devices_by_host.get(host)
+        if device is not None:
+            apply_action(device, action)
+        return ActionEvent(action, host, mac, device, time.time())
+
+    async def _handle_request(self, http_request: web.Request) -> web.Response:
+        """Answer a callback of a device."""
+        self.received += 1
+        event = self.handle(http_request.remote, http_request.query)
+        if event is None:
+            return web.Response(status=400, text="Unknown action")
+        _LOGGER.debug("Action %s from %s", event.action, event.host)
+        self._publish(event)
+        return web.Response(text="")
+
+    def add_routes(self, app: web.Application) -> None:
+        """Add the callback endpoint to an existing application."""
+        app.router.add_get(self.path, self._handle_request)
+
+    async def start(self) -> None:
+        """Start listening for callbacks."""
+        if self.running:
+            return
+        app = web.Application()
+        self.add_routes(app)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.listen_host, self.port)
+        await site.start()
+        if not self.port:
+            self.port = self._runner.addresses[0][1]
+
+    async def stop(self) -> None:
+        """Stop listening for callbacks."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "ActionReceiver":
+        """Async enter."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Async exit."""
+        await self.stop()
@@ -0,0 +1,169 @@
+"""Retry policy and circuit breaker for unreachable myStrom devices."""
+
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional
+
+_LOGGER = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Consecutive failures after which a host is skipped
+FAILURE_THRESHOLD = 3
+# Seconds until a skipped host is probed again
+RESET_TIMEOUT = 10.0
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Representation of a retry policy with exponential backoff and jitter.
+
+    Only idempotent methods are retried, ``/toggle`` is a GET request but
+    is never retried.
+    """
+
+    retries: int = 0
+    backoff: float = 0.1
+    max_backoff: float = 2.0
+    methods: FrozenSet[str] = frozenset({"GET"})
+
+    def should_retry(self, method: str, path: str, attempt: int) -> bool:
+        """Return True if a failed attempt should be retried."""
+        return (
+            attempt < self.retries
+            and method.upper() in self.methods
+            and not path.endswith("/toggle")
+        )
+
+    def delay(self, attempt: int) -> float:
+        """Return the delay before the next attempt (full jitter)."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+
+class CircuitBreaker:
+    """A circuit breaker for a single host."""
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+    ) -> None:
+        """Initialize the circuit breaker."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        """Return the current state of the circuit breaker."""
+        if self._opened_at is None:
+            return STATE_CLOSED
+        if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout:
+            return STATE_HALF_OPEN
+        return STATE_OPEN
+
+    def allow_request(self) -> bool:
+        """Return True if a request may be sent, only one probe when half-open."""
+        state = self.state
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        """Record that the host answered."""
+        self.failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        """Record that the host could not be reached."""
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def record_aborted(self) -> None:
+        """Record that a request ended without a result, e.g. it was cancelled.
+
+        A probe counts as failed, so the host is probed again later.
+        """
+        if self._probing:
+            self.record_failure()
+
+
+class CircuitBreakerRegistry:
+    """Representation of the circuit breakers of all hosts."""
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        enabled: bool = True,
+    ) -> None:
+        """Initialize the registry."""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.enabled = enabled
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, host: str) -> CircuitBreaker:
+        """Get the circuit breaker of a host."""
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(
+                self.failure_threshold, self.reset_timeout
+            )
+        return breaker
+
+    def allow_request(self, host: str) -> bool:
+        """Return True if a request to the host may be sent."""
+        return not self.enabled or self.get(host).allow_request()
+
+    def record_success(self, host: str) -> None:
+        """Record that the host answered."""
+        if self.enabled:
+            self.get(host).record_success()
+
+    def record_failure(self, host: str) -> None:
+        """Record that the host could not be reached."""
+        if self.enabled:
+            breaker = self.get(host)
+            breaker.record_failure()
+            if breaker.state == STATE_OPEN:
+                _LOGGER.debug("Skipping requests to %s for now", host)
+
+    def record_aborted(self, host: str) -> None:
+        """Record that a request to the host ended without a result."""
+        if self.enabled:
+            self.get(host).record_aborted()
+
+    def reset(self, host: Optional[str] = None) -> None:
+        """Reset the circuit breaker of a host or of all hosts."""
+        if host is None:
+            self._breakers.clear()
+        else:
+            self._breakers.pop(host, None)
+
+
+CIRCUIT_BREAKERS = CircuitBreakerRegistry()
+RETRY_POLICY = RetryPolicy()
+
+
+def get_retry_policy() -> RetryPolicy:
+    """Get the retry policy used for all requests."""
+    return RETRY_POLICY
+
+
+def set_retry_policy(policy: RetryPolicy) -> None:
+    """Set the retry policy used for all requests."""
+    global RETRY_POLICY
+    RETRY_POLICY = policy
@@ -0,0 +1,102 @@
+"""Support for finding myStrom devices by actively probing a network."""
+
+import asyncio
+import ipaddress
+import logging
+from typing import AsyncIterator, Iterator, Optional
+
+import aiohttp
+
+from . import MyStromDevice
+from .capabilities import CAPABILITIES
+from .exceptions import MyStromError
+from .factory import create_device
+from .fleet import Device
+from .resilience import CIRCUIT_BREAKERS
+from .switch import MyStromSwitch
+
+_LOGGER = logging.getLogger(__name__)
+
+SCAN_CONCURRENCY = 64
+CONNECT_TIMEOUT_MS = 500
+# Time in seconds for a probe including reading the device info
+PROBE_TIMEOUT = 3
+
+
+def _hosts(network: str) -> Iterator[str]:
+    """Return the hosts of a network in CIDR notation or a single address."""
+    return (str(host) for host in ipaddress.ip_network(network, strict=False).hosts())
+
+
+async def probe_host(
+    host: str,
+    session: aiohttp.client.ClientSession = None,
+    token: Optional[str] = None,
+    connect_timeout_ms: int = CONNECT_TIMEOUT_MS,
+) -> Optional[Device]:
+    """Probe a host for a myStrom device, returns None if there is none.
+
+    Legacy firmware does not report a type, such devices are switches.
+    """
+    timeout = aiohttp.ClientTimeout(
+        total=PROBE_TIMEOUT, sock_connect=connect_timeout_ms / 1000
+    )
+    probe = MyStromDevice(host, session, timeout=timeout)
+    try:
+        info = await probe.get_device_info(token)
+    except MyStromError:
+        info = None
+    if not isinstance(info, dict) or "mac" not in info:
+        # Do not keep records of every probed address
+        CAPABILITIES.forget(host)
+        CIRCUIT_BREAKERS.reset(host)
+        return None
+
+    if info.get("type") is None:
+        return MyStromSwitch(host, session=session, token=token)
+    return create_device(
+        host, info.get("type"), info["mac"], session=session, token=token
+    )
+
+
+async def scan_network(
+    network: str,
+    session: aiohttp.client.ClientSession = None,
+    token: Optional[str] = None,
+    concurrency: int = SCAN_CONCURRENCY,
+    connect_timeout_ms: int = CONNECT_TIMEOUT_MS,
+) -> AsyncIterator[Device]:
+    """Probe all hosts of a network concurrently for myStrom devices.
+
+    Found devices are yielded as soon as they answered. This works in networks
+    which do not forward the broadcasts used by ``discover_devices()``.
+    """
+    hosts = _hosts(network)
+    found: asyncio.Queue = asyncio.Queue()
+
+    async def _worker() -> None:
+        """Probe hosts until all were probed."""
+        for host in hosts:
+            device = await probe_host(host, session, token, connect_timeout_ms)
+            if device is not None:
+                _LOGGER.debug("Found %s at %s", type(device).__name__, host)
+                found.put_nowait(device)
+
+    workers = [asyncio.ensure_future(_worker()) for _ in range(concurrency)]
+    done = asyncio.ensure_future(asyncio.gather(*workers))
+    try:
+        while not done.done() or not found.empty():
+            getter = asyncio.ensure_future(found.get())
+            await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+            else:
+                getter.cancel()
+        # Raise errors of the workers
+        await done
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        if not done.done():
+            done.cancel()
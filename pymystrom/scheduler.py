@@ -0,0 +1,243 @@
+"""Support for polling myStrom devices with an adaptive interval."""
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .fleet import DEVICE_TIMEOUT, Device, refresh_device
+from .pir import MyStromPir
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds between two polls of the same device
+MIN_INTERVAL = 2.0
+MAX_INTERVAL = 60.0
+# Factor to increase the interval after a poll without changes
+BACKOFF = 1.5
+# Maximum number of polls per second for all devices
+REQUEST_BUDGET = 10.0
+# Changes of the power below the absolute (W) or relative threshold are noise
+POWER_THRESHOLD = 2.0
+POWER_CHANGE = 0.1
+# Random spread of the intervals to avoid synchronized polls
+JITTER = 0.1
+
+
+def snapshot(device: Device) -> Tuple:
+    """Return the values of a device which are watched for changes."""
+    if isinstance(device, MyStromPir):
+        return (device.sensors or {}).get("motion"), None
+    report = getattr(device, "report", None)
+    if report is None:
+        return getattr(device, "state", None), None
+    return report.relay, report.power
+
+
+def has_changed(old: Optional[Tuple], new: Tuple) -> bool:
+    """Return True if the state (relay or motion) or the power changed."""
+    if old is None or old[0] != new[0]:
+        return True
+    old_power, power = old[1], new[1]
+    if old_power is None or power is None:
+        return old_power != power
+    return abs(power - old_power) > max(POWER_THRESHOLD, abs(old_power) * POWER_CHANGE)
+
+
+class DeviceSchedule:
+    """Representation of the polling state of a single device."""
+
+    __slots__ = ("device", "interval", "due", "snapshot", "changes", "errors")
+
+    def __init__(self, device: Device, interval: float, due: float) -> None:
+        """Initialize the schedule."""
+        self.device = device
+        self.interval = interval
+        self.due = due
+        self.snapshot: Optional[Tuple] = None
+        self.changes = 0
+        self.errors = 0
+
+
+class PollingScheduler:
+    """A scheduler that polls devices with an interval based on their changes.
+
+    After a change of ``relay``, ``power`` or ``motion`` a device is polled
+    every ``min_interval`` seconds, the interval grows by ``backoff`` with
+    every poll without changes up to ``max_interval``. The polls of all
+    devices are spread evenly and limited to ``budget`` per second.
+    """
+
+    def __init__(
+        self,
+        devices: Iterable[Device] = (),
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+        backoff: float = BACKOFF,
+        budget: float = REQUEST_BUDGET,
+        timeout: float = DEVICE_TIMEOUT,
+        callback: Optional[Callable[[Device, bool], None]] = None,
+    ) -> None:
+        """Initialize the scheduler.
+
+        The ``callback`` is called after every successful poll with the device
+        and True if it changed.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.budget = budget
+        self.timeout = timeout
+        self.callback = callback
+        self._schedules: Dict[str, DeviceSchedule] = {}
+        self._queue: List[Tuple[float, int, str]] = []
+        self._counter = 0
+        self._next_slot = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._polls: set = set()
+        for device in devices:
+            self.add(device)
+
+    def _push(self, schedule: DeviceSchedule) -> None:
+        """Queue the next poll of a device."""
+        self._counter += 1
+        heapq.heappush(
+            self._queue, (schedule.due, self._counter, schedule.device._host)
+        )
+        self._wakeup.set()
+
+    def add(self, device: Device) -> None:
+        """Add a device, the first polls are spread over the minimum interval."""
+        due = time.monotonic() + random.uniform(0, self.min_interval)
+        schedule = self._schedules[device._host] = DeviceSchedule(
+            device, self.min_interval, due
+        )
+        self._push(schedule)
+
+    def remove(self, device: Device) -> None:
+        """Stop polling a device."""
+        self._schedules.pop(device._host, None)
+
+    def poll_soon(self, device: Device) -> None:
+        """Poll a device as soon as the budget allows, e.g. after an action."""
+        schedule = self._schedules.get(device._host)
+        if schedule is None:
+            return
+        schedule.interval = self.min_interval
+        # A running poll queues the next one itself
+        if schedule.due != float("inf"):
+            schedule.due = time.monotonic()
+            self._push(schedule)
+
+    def interval(self, host: str) -> Optional[float]:
+        """Return the current interval of a host."""
+        schedule = self._schedules.get(host)
+        return schedule.interval if schedule is not None else None
+
+    @property
+    def intervals(self) -> Dict[str, float]:
+        """Return the current interval per host."""
+        return {host: schedule.interval for host, schedule in self._schedules.items()}
+
+    @property
+    def schedules(self) -> List[DeviceSchedule]:
+        """Return the polling state of all devices."""
+        return list(self._schedules.values())
+
+    def update(self, schedule: DeviceSchedule) -> bool:
+        """Adapt the interval to the new state, returns True if it changed."""
+        new = snapshot(schedule.device)
+        changed = has_changed(schedule.snapshot, new)
+        schedule.snapshot = new
+        if changed:
+            schedule.changes += 1
+            schedule.interval = self.min_interval
+        else:
+            schedule.interval = min(self.max_interval, schedule.interval * self.backoff)
+        return changed
+
+    async def _poll(self, schedule: DeviceSchedule) -> None:
+        """Poll a device and queue the next poll."""
+        host = schedule.device._host
+        try:
+            await asyncio.wait_for(refresh_device(schedule.device), self.timeout)
+        except Exception as exception:
+            _LOGGER.debug("Polling %s failed: %s", host, exception)
+            schedule.errors += 1
+            schedule.interval = min(self.max_interval, schedule.interval * self.backoff)
+        else:
+            changed = self.update(schedule)
+            if self.callback is not None:
+                try:
+                    self.callback(schedule.device, changed)
+                except Exception:
+                    _LOGGER.exception("Error in polling callback %s", self.callback)
+        if self._schedules.get(host) is schedule:
+            spread = random.uniform(1 - JITTER, 1 + JITTER)
+            schedule.due = time.monotonic() + schedule.interval * spread
+            self._push(schedule)
+
+    async def _wait(self, timeout: Optional[float]) -> None:
+        """Wait until the timeout or a change of the queue."""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self) -> None:
+        """Poll the devices until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queue:
+                await self._wait(None)
+                continue
+            due, _, host = self._queue[0]
+            schedule = self._schedules.get(host)
+            if schedule is None or schedule.due != due:
+                # Removed or rescheduled in the meantime
+                heapq.heappop(self._queue)
+                continue
+            now = time.monotonic()
+            if due > now:
+                await self._wait(due - now)
+                continue
+            if self._next_slot > now:
+                await asyncio.sleep(self._next_slot - now)
+                now = time.monotonic()
+            self._next_slot = max(now, self._next_slot) + 1 / self.budget
+            heapq.heappop(self._queue)
+            schedule.due = float("inf")
+            task = loop.create_task(self._poll(schedule))
+            self._polls.add(task)
+            task.add_done_callback(self._polls.discard)
+
+    def start(self) -> None:
+        """Start polling in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        """Stop polling and wait for the running polls."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._polls):
+            task.cancel()
+        await asyncio.gather(*self._polls, return_exceptions=True)
+
+    async def __aenter__(self) -> "PollingScheduler":
+        """Async enter."""
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        """Async exit."""
+        await self.stop()
@@ -0,0 +1,138 @@
+"""Shared client session for all myStrom devices."""
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Optional
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+from .instrumentation import create_trace_config
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_LOGGER = logging.getLogger(__name__)
+
+# Total number of simultaneous connections
+LIMIT = 100
+# The devices have a small HTTP server, keep the number of connections low
+LIMIT_PER_HOST = 2
+# Seconds to cache DNS lookups
+DNS_CACHE_TTL = 300
+# Seconds to keep idle connections open
+KEEPALIVE_TIMEOUT = 30
+
+# Default decoder of the raw body of JSON responses, orjson is used if
+# installed. Use ``configure_session(json_loads=...)`` to change it.
+_JSON_LOADS: Callable[[bytes], Any] = orjson.loads if orjson else json.loads
+
+
+class SessionManager:
+    """A class that manages the client session shared by all devices."""
+
+    def __init__(
+        self,
+        limit: int = LIMIT,
+        limit_per_host: int = LIMIT_PER_HOST,
+        ttl_dns_cache: int = DNS_CACHE_TTL,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+        json_loads: Callable[[bytes], Any] = _JSON_LOADS,
+        resolver: Optional[AbstractResolver] = None,
+    ) -> None:
+        """Initialize the session manager, ``resolver`` replaces the DNS lookups."""
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.ttl_dns_cache = ttl_dns_cache
+        self.keepalive_timeout = keepalive_timeout
+        self.json_loads = json_loads
+        self.resolver = resolver
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def configure(self, **kwargs) -> None:
+        """Change the connection pool settings.
+
+        The connector settings are applied when the next session is created,
+        call ``close()`` first to apply them to a running session. The JSON
+        decoder is applied immediately.
+        """
+        for key, value in kwargs.items():
+            if not hasattr(self, key) or key.startswith("_"):
+                raise TypeError(f"Unknown session setting '{key}'")
+            setattr(self, key, value)
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Create a client session with a tuned connector."""
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.ttl_dns_cache,
+            keepalive_timeout=self.keepalive_timeout,
+            resolver=self.resolver,
+        )
+        return aiohttp.ClientSession(
+            connector=connector, trace_configs=[create_trace_config()]
+        )
+
+    def _close_stale_session(self) -> None:
+        """Close a session which belongs to another event loop."""
+        session, loop = self._session, self._loop
+        self._session = self._loop = None
+        _LOGGER.warning(
+            "Closing the shared client session of a previous event loop, "
+            "call close_session() before the loop ends"
+        )
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        connector = session.connector
+        session.detach()
+        if connector is not None:
+            # Nothing to wait for, the event loop of the connections is gone
+            connector.close()
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Get the shared client session, creating it if needed."""
+        loop = asyncio.get_running_loop()
+        if self._session is not None and self._loop is not loop:
+            if not self._session.closed:
+                self._close_stale_session()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            _LOGGER.debug("Creating shared client session")
+            self._session = self._create_session()
+            self._loop = loop
+        return self._session
+
+    @property
+    def session(self) -> Optional[aiohttp.ClientSession]:
+        """Return the shared client session if one is open."""
+        if self._session is None or self._session.closed:
+            return None
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared client session and release all connections."""
+        session, self._session = self._session, None
+        self._loop = None
+        if session is not None and not session.closed:
+            await session.close()
+
+
+SESSION_MANAGER = SessionManager()
+
+
+def configure_session(**kwargs) -> None:
+    """Change the connection pool settings of the shared session.
+
+    The JSON decoder of all responses is set with ``json_loads``.
+    """
+    SESSION_MANAGER.configure(**kwargs)
+
+
+async def close_session() -> None:
+    """Close the shared client session, e.g. on shutdown."""
+    await SESSION_MANAGER.close()
@@ -1,12 +1,45 @@
 """Support for communicating with myStrom plugs/switches."""
 
-from typing import Optional, Union
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Mapping, Optional, Union
 
 import aiohttp
 from yarl import URL
 
 from . import _request as request
+from .capabilities import CAPABILITIES, DeviceCapabilities, fetch_device_info
 from .device_types import DEVICE_MAPPING_LITERAL, DEVICE_MAPPING_NUMERIC
+from .exceptions import MyStromHTTPError, MyStromNotVersionTwoSwitch
+
+INFO_TTL = 3600
+
+
+@dataclass(frozen=True, slots=True)
+class SwitchReport:
+    """Immutable snapshot of the ``/report`` of a switch/plug."""
+
+    relay: Any = None
+    power: Optional[float] = 0
+    Ws: Optional[float] = 0
+    boot_id: Optional[str] = None
+    energy_since_boot: Optional[float] = None
+    time_since_boot: Optional[int] = None
+    temperature: Optional[float] = None
+
+    @classmethod
+    def from_report(cls, response: Mapping[str, Any]) -> "SwitchReport":
+        """Create the snapshot from a ``/report`` response."""
+        get = response.get
+        return cls(
+            relay=response["relay"],
+            power=get("power"),
+            Ws=get("Ws"),
+            boot_id=get("boot_id"),
+            energy_since_boot=get("energy_since_boot"),
+            time_since_boot=get("time_since_boot"),
+            temperature=get("temperature"),
+        )
 
 
 class MyStromSwitch:
@@ -17,86 +50,92 @@ class MyStromSwitch:
         host: str,
         session: aiohttp.client.ClientSession = None,
         token: Optional[str] = None,
+        info_ttl: float = INFO_TTL,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
     ) -> None:
         """Initialize the switch."""
         self._close_session = False
         self._host = host
         self._token = token
         self._session = session
-        self._consumption = 0
-        self._consumedWs = 0
-        self._boot_id = None
-        self._energy_since_boot = None
-        self._time_since_boot = None
-        self._state = None
-        self._temperature = None
+        self._timeout = timeout
+        self._report = SwitchReport()
         self._firmware = None
         self._mac = None
         self._device_type: Optional[Union[str, int]] = None
+        self._info_ttl = info_ttl
+        self._info_expires: Optional[float] = None
+        self._info_boot_id = None
         self.uri = URL.build(scheme="http", host=self._host)
 
-    async def turn_on(self) -> None:
-        """Turn the relay on."""
+    async def turn_on(self, refresh: bool = True) -> None:
+        """Turn the relay on, without ``refresh`` the state is not read back."""
         parameters = {"state": "1"}
         url = URL(self.uri).join(URL("relay"))
         await request(self, uri=url, params=parameters, token=self._token)
-        await self.get_state()
+        if refresh:
+            await self.get_state()
+        else:
+            self._report = replace(self._report, relay=True)
 
-    async def turn_off(self) -> None:
-        """Turn the relay off."""
+    async def turn_off(self, refresh: bool = True) -> None:
+        """Turn the relay off, without ``refresh`` the state is not read back."""
         parameters = {"state": "0"}
         url = URL(self.uri).join(URL("relay"))
         await request(self, uri=url, params=parameters, token=self._token)
-        await self.get_state()
+        if refresh:
+            await self.get_state()
+        else:
+            self._report = replace(self._report, relay=False)
 
-    async def toggle(self) -> None:
-        """Toggle the relay."""
+    async def toggle(self, refresh: bool = True) -> None:
+        """Toggle the relay, without ``refresh`` the state is not read back."""
         url = URL(self.uri).join(URL("toggle"))
         await request(self, uri=url, token=self._token)
-        await self.get_state()
+        if refresh:
+            await self.get_state()
 
     async def get_state(self) -> None:
-        """Get the details from the switch/plug."""
+        """Get the details from the switch/plug.
+
+        The static device info is only fetched again if the cached copy is
+        older than the TTL or the device was restarted (``boot_id`` changed).
+        """
+        await self.get_report()
+        if self._info_is_stale():
+            await self.get_info()
+
+    async def get_report(self) -> None:
+        """Get the current state and power consumption from the switch/plug."""
         url = URL(self.uri).join(URL("report"))
         response = await request(self, uri=url, token=self._token)
-        try:
-            self._consumption = response["power"]
-        except KeyError:
-            self._consumption = None
-        try:
-            self._consumedWs = response["Ws"]
-        except KeyError:
-            self._consumedWs = None
-        try:
-            self._boot_id = response["boot_id"]
-        except KeyError:
-            self._boot_id = None
-        try:
-            self._energy_since_boot = response["energy_since_boot"]
-        except KeyError:
-            self._energy_since_boot = None
-        try:
-            self._time_since_boot = response["time_since_boot"]
-        except KeyError:
-            self._time_since_boot = None
-        self._state = response["relay"]
-        try:
-            self._temperature = response["temperature"]
-        except KeyError:
-            self._temperature = None
+        self._report = SwitchReport.from_report(response)
 
-        # Try the new API (Devices with newer firmware)
-        url = URL(self.uri).join(URL("api/v1/info"))
-        response = await request(self, uri=url, token=self._token)
-        if not isinstance(response, dict):
-            # Fall back to the old API version if the device runs with old firmware
-            url = URL(self.uri).join(URL("info.json"))
-            response = await request(self, uri=url, token=self._token)
+    async def get_info(self) -> None:
+        """Get the static device info (firmware, MAC and type)."""
+        response = await fetch_device_info(self, request, token=self._token)
 
         # Tolerate missing keys on legacy firmware (e.g., v1 devices)
         self._firmware = response.get("version")
         self._mac = response.get("mac")
         self._device_type = response.get("type")
+        self._info_expires = time.monotonic() + self._info_ttl
+        self._info_boot_id = self._report.boot_id
+
+    def _info_is_stale(self) -> bool:
+        """Return True if the cached device info must be refreshed."""
+        if self._info_expires is None or time.monotonic() >= self._info_expires:
+            return True
+        return self._report.boot_id != self._info_boot_id
+
+    def invalidate_info(self) -> None:
+        """Drop the cached device info."""
+        self._info_expires = None
+
+    @property
+    def capabilities(self) -> DeviceCapabilities:
+        """Return the detected capabilities of the switch/plug."""
+        return CAPABILITIES.get(self._host)
 
     @property
     def device_type(self) -> Optional[str]:
@@ -107,44 +146,49 @@ class MyStromSwitch:
             return DEVICE_MAPPING_LITERAL.get(self._device_type)
         return None
 
+    @property
+    def report(self) -> SwitchReport:
+        """Return the snapshot of the latest report."""
+        return self._report
+
     @property
     def relay(self) -> bool:
         """Return the relay state."""
-        return bool(self._state)
+        return bool(self._report.relay)
 
     @property
     def consumption(self) -> Optional[float]:
         """Return the current power consumption in mWh."""
-        if self._consumption is not None:
-            return round(self._consumption, 1)
+        if self._report.power is not None:
+            return round(self._report.power, 1)
 
-        return self._consumption
+        return self._report.power
 
     @property
     def consumedWs(self) -> Optional[float]:
         """The average of energy consumed per second since last report call."""
-        if self._consumedWs is not None:
-            return round(self._consumedWs, 1)
+        if self._report.Ws is not None:
+            return round(self._report.Ws, 1)
 
-        return self._consumedWs
+        return self._report.Ws
 
     @property
     def boot_id(self) -> Optional[str]:
         """A unique identifier to distinguish whether the energy counter has been reset."""
-        return self._boot_id
+        return self._report.boot_id
 
     @property
     def energy_since_boot(self) -> Optional[float]:
         """The total energy in watt seconds (Ws) that has been measured since the last power-up or restart of the device."""
-        if self._energy_since_boot is not None:
-            return round(self._energy_since_boot, 2)
+        if self._report.energy_since_boot is not None:
+            return round(self._report.energy_since_boot, 2)
 
-        return self._energy_since_boot
+        return self._report.energy_since_boot
 
     @property
     def time_since_boot(self) -> Optional[int]:
         """The time in seconds that has elapsed since the last start or restart of the device."""
-        return self._time_since_boot
+        return self._report.time_since_boot
 
     @property
     def firmware(self) -> Optional[str]:
@@ -159,15 +203,25 @@ class MyStromSwitch:
     @property
     def temperature(self) -> Optional[float]:
         """Return the current temperature in Celsius."""
-        if self._temperature is not None:
-            return round(self._temperature, 1)
+        if self._report.temperature is not None:
+            return round(self._report.temperature, 1)
 
-        return self._temperature
+        return self._report.temperature
 
     async def get_temperature_full(self) -> str:
         """Get current temperature in celsius."""
+        if self.capabilities.supports("temp") is False:
+            raise MyStromNotVersionTwoSwitch("The device has no temperature sensor.")
         url = URL(self.uri).join(URL("temp"))
-        response = await request(self, uri=url, token=self._token)
+        try:
+            response = await request(self, uri=url, token=self._token)
+        except MyStromHTTPError as exception:
+            # Some firmware also answers 404 if the token is wrong, only trust
+            # it if the device info was fetched with the same token
+            if exception.status == 404 and self._info_expires is not None:
+                self.capabilities.set_supported("temp", False)
+            raise
+        self.capabilities.set_supported("temp", True)
         return response
 
     async def close(self) -> None:
@@ -0,0 +1,175 @@
+"""Tests for animating myStrom bulbs."""
+
+import asyncio
+
+import pytest
+
+import pymystrom.bulb as bulb_module
+from pymystrom.animation import (
+    MODE_MONO,
+    Keyframe,
+    animate,
+    compile_keyframes,
+    flashing,
+    rainbow,
+)
+from pymystrom.bulb import MyStromBulb
+
+
+def test_compile_keyframes():
+    """Test that keyframes are turned into few commands with ramps."""
+    frames = compile_keyframes(rainbow(30))
+    assert len(frames) == 7
+    assert frames[0].color == "0;100;100"
+    assert frames[0].ramp == 0
+    assert frames[1].time == 0
+    assert frames[1].color == "60;100;100"
+    assert frames[1].ramp == 5000
+    assert frames[-1].color == "359;100;100"
+
+    # Long ramps are split, holds need no command
+    frames = compile_keyframes(
+        [
+            Keyframe(0, (3, 0), MODE_MONO),
+            Keyframe(15, (3, 100), MODE_MONO),
+            Keyframe(20, (3, 100), MODE_MONO),
+        ]
+    )
+    assert [(frame.time, frame.color, frame.ramp) for frame in frames] == [
+        (0, "3;0", 0),
+        (0, "3;50", 7500),
+        (7.5, "3;100", 7500),
+    ]
+
+    frames = compile_keyframes(flashing(3, (0, 100, 100), (240, 100, 100)))
+    assert [(frame.time, frame.color, frame.ramp) for frame in frames] == [
+        (0, "0;100;100", 0),
+        (0.9, "240;100;100", 100),
+        (1.9, "0;100;100", 100),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_animate_many_bulbs(monkeypatch):
+    """Test that many bulbs are animated in sync and late frames are dropped."""
+    called = []
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function of a slow bulb."""
+        called.append((self.mac, data))
+        if self.mac == "SLOW":
+            await asyncio.sleep(0.15)
+        return {}
+
+    monkeypatch.setattr(bulb_module, "request", _fake_request)
+    bulbs = [MyStromBulb("10.12.0.1", "FAST"), MyStromBulb("10.12.0.2", "SLOW")]
+    keyframes = [
+        Keyframe(0, (0, 100, 100)),
+        Keyframe(0.1, (30, 100, 100)),
+        Keyframe(0.2, (60, 100, 100)),
+        Keyframe(0.3, (90, 100, 100)),
+    ]
+    result = await animate(bulbs, keyframes)
+    assert result.errors == {}
+    fast = [data for mac, data in called if mac == "FAST"]
+    slow = [data for mac, data in called if mac == "SLOW"]
+    # Late commands get a shorter ramp
+    assert [data.split("&ramp=")[0] for data in fast] == [
+        "action=on&color=0;100;100",
+        "action=on&color=30;100;100",
+        "action=on&color=60;100;100",
+        "action=on&color=90;100;100",
+    ]
+    assert all(int(data.split("&ramp=")[1]) <= 100 for data in fast)
+    # A frame was dropped, the final color is always sent
+    assert len(slow) == 3
+    assert slow[-1].startswith("action=on&color=90;100;100")
+    assert result.sent == 7
+    assert result.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_set_rainbow(monkeypatch):
+    """Test that a short rainbow is a single ramp."""
+    called = []
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function to capture the commands."""
+        called.append(data)
+
+    monkeypatch.setattr(bulb_module, "request", _fake_request)
+    await MyStromBulb("10.12.0.3", "AABBCCDDEEFF").set_rainbow(0.3)
+    assert [data.split("&ramp=")[0] for data in called] == [
+        "action=on&color=0;100;100",
+        "action=on&color=359;100;100",
+    ]
+    # Late commands get a shorter ramp
+    assert 250 <= int(called[1].split("&ramp=")[1]) <= 300
+
+
+@pytest.mark.asyncio
+async def test_animate_keeps_holds(monkeypatch):
+    """Test that an opening hold delays the following frames."""
+    called = []
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function to capture the time of the commands."""
+        called.append((loop.time(), data))
+
+    monkeypatch.setattr(bulb_module, "request", _fake_request)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await animate(
+        [MyStromBulb("10.12.0.4", "AABBCCDDEEFF")],
+        [
+            Keyframe(0, (0, 100, 100)),
+            Keyframe(0.3, (0, 100, 100)),
+            Keyframe(0.4, (120, 100, 100)),
+        ],
+        lead=0,
+    )
+    assert [data.split("&ramp=")[0] for _, data in called] == [
+        "action=on&color=0;100;100",
+        "action=on&color=120;100;100",
+    ]
+    assert 50 <= int(called[1][1].split("&ramp=")[1]) <= 100
+    assert called[1][0] - start >= 0.3
+    assert loop.time() - start >= 0.4
+
+
+@pytest.mark.asyncio
+async def test_flashing_timing(monkeypatch):
+    """Test that each color is shown for a second for the whole duration."""
+    called = []
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function to capture the time of the commands."""
+        called.append((loop.time(), data))
+
+    monkeypatch.setattr(bulb_module, "request", _fake_request)
+    keyframes = flashing(3, (0, 100, 100), (240, 100, 100))
+    assert keyframes[-1].time == 3
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    # Ten times faster
+    await animate(
+        [MyStromBulb("10.12.0.5", "AABBCCDDEEFF")],
+        [Keyframe(keyframe.time / 10, keyframe.color) for keyframe in keyframes],
+        lead=0,
+    )
+    assert [data.split("&ramp=")[0] for _, data in called] == [
+        "action=on&color=0;100;100",
+        "action=on&color=240;100;100",
+        "action=on&color=0;100;100",
+    ]
+    assert called[1][0] - start >= 0.09
+    assert called[2][0] - start >= 0.19
+    assert loop.time() - start >= 0.3
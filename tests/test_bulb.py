@@ -1,5 +1,7 @@
 """Tests for myStrom bulbs."""
 
+import asyncio
+
 import pytest
 
 import pymystrom.bulb as bulb_module
@@ -180,3 +182,40 @@ async def test_get_state(monkeypatch):
     assert bulb.state is True
     assert bulb.bulb_type == "RGB"
     assert bulb.consumption == 5.5
+
+
+@pytest.mark.asyncio
+async def test_coalesced_commands(monkeypatch):
+    """Test that commands to a slow bulb are merged, the last one wins."""
+    called = []
+    in_flight = 0
+
+    async def _fake_request(
+        self, uri, method="POST", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function of a slow bulb."""
+        nonlocal in_flight
+        in_flight += 1
+        assert in_flight == 1
+        called.append(data)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return {"result": len(called)}
+
+    monkeypatch.setattr(bulb_module, "request", _fake_request)
+    bulb = MyStromBulb("127.0.0.1", "AABBCCDDEEFF", coalesce=True)
+    first = asyncio.ensure_future(bulb.set_color_hsv(0, 100, 100))
+    await asyncio.sleep(0)
+    responses = await asyncio.gather(
+        first,
+        bulb.set_transition_time(200),
+        *(bulb.set_color_hsv(hue, 100, 100) for hue in range(1, 30)),
+        bulb.set_off(),
+    )
+    assert called == [
+        "action=on&color=0;100;100",
+        "ramp=200&action=off&color=29;100;100",
+    ]
+    assert responses[0] == {"result": 1}
+    assert all(response == {"result": 2} for response in responses[1:])
+    assert bulb._writer.requests == 2
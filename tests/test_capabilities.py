@@ -0,0 +1,144 @@
+"""Tests for the capability detection of myStrom devices."""
+
+import pytest
+
+import pymystrom as pymystrom_module
+import pymystrom.switch as switch_module
+from pymystrom import MyStromDevice
+from pymystrom.capabilities import API_V1, API_V2, CAPABILITIES, CapabilityRegistry
+from pymystrom.exceptions import (
+    MyStromAuthenticationError,
+    MyStromHTTPError,
+    MyStromNotVersionTwoSwitch,
+)
+from pymystrom.switch import MyStromSwitch
+
+
+@pytest.mark.asyncio
+async def test_legacy_firmware_is_probed_once(monkeypatch):
+    """Test that the fallback to /info.json is only probed once per host."""
+    called = []
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function for a device with legacy firmware."""
+        called.append(uri.path)
+        if uri.path == "/info.json":
+            return {"version": "2.59.32", "mac": "AA:BB:CC:DD:EE:01"}
+        return "Not found"
+
+    monkeypatch.setattr(pymystrom_module, "_request", _fake_request)
+    device = MyStromDevice("10.1.0.1")
+    await device.get_device_info()
+    await device.get_device_info()
+    assert called == ["/api/v1/info", "/info.json", "/info.json"]
+    assert device.capabilities.api_version == API_V1
+    assert device.capabilities.token_required is False
+
+
+@pytest.mark.asyncio
+async def test_capabilities_shared_between_classes(monkeypatch):
+    """Test that a detected API version is reused by other device classes."""
+    called = []
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function for a device with new firmware."""
+        called.append(uri.path)
+        return {"version": "3.82.60", "mac": "AA:BB:CC:DD:EE:02", "type": 106}
+
+    monkeypatch.setattr(pymystrom_module, "_request", _fake_request)
+    monkeypatch.setattr(switch_module, "request", _fake_request)
+    await MyStromDevice("10.1.0.2").get_device_info()
+    switch = MyStromSwitch("10.1.0.2", token="secret")
+    await switch.get_info()
+    assert called == ["/api/v1/info", "/api/v1/info"]
+    assert switch.capabilities.api_version == API_V2
+
+
+@pytest.mark.asyncio
+async def test_unsupported_temperature_endpoint():
+    """Test that a known missing /temp endpoint is not requested."""
+    switch = MyStromSwitch("10.1.0.3")
+    switch.capabilities.set_supported("temp", False)
+    with pytest.raises(MyStromNotVersionTwoSwitch):
+        await switch.get_temperature_full()
+
+
+@pytest.mark.asyncio
+async def test_temperature_not_found_with_wrong_token(monkeypatch):
+    """Test that a 404 is only trusted once the token is known to work."""
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function for a switch without a temperature sensor."""
+        if uri.path == "/temp":
+            raise MyStromHTTPError(404, "Not found")
+        return {"version": "3.82.60", "mac": "AA:BB:CC:DD:EE:07", "type": 106}
+
+    monkeypatch.setattr(switch_module, "request", _fake_request)
+    switch = MyStromSwitch("10.1.0.7", token="wrong")
+    # The 404 may also mean a wrong token
+    with pytest.raises(MyStromHTTPError):
+        await switch.get_temperature_full()
+    assert switch.capabilities.supports("temp") is None
+
+    await switch.get_info()
+    with pytest.raises(MyStromHTTPError):
+        await switch.get_temperature_full()
+    assert switch.capabilities.supports("temp") is False
+    CAPABILITIES.forget("10.1.0.7")
+
+
+@pytest.mark.asyncio
+async def test_fallback_on_not_found(monkeypatch):
+    """Test the fallback to /info.json if /api/v1/info does not exist."""
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function for a device without /api/v1/info."""
+        if uri.path == "/api/v1/info":
+            raise MyStromHTTPError(404, "Not found")
+        return {"version": "2.59.32", "mac": "AA:BB:CC:DD:EE:06"}
+
+    monkeypatch.setattr(pymystrom_module, "_request", _fake_request)
+    device = MyStromDevice("10.1.0.6")
+    info = await device.get_device_info()
+    assert info["mac"] == "AA:BB:CC:DD:EE:06"
+    assert device.capabilities.api_version == API_V1
+
+
+@pytest.mark.asyncio
+async def test_token_required_is_detected(monkeypatch):
+    """Test that a rejected request without token is recorded."""
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function for a device that requires a token."""
+        raise MyStromAuthenticationError(401, "Unauthorized")
+
+    monkeypatch.setattr(pymystrom_module, "_request", _fake_request)
+    device = MyStromDevice("10.1.0.7")
+    with pytest.raises(MyStromAuthenticationError):
+        await device.get_device_info()
+    assert device.capabilities.token_required is True
+
+
+def test_registry_persistence(tmp_path):
+    """Test that the capabilities survive a restart."""
+    path = tmp_path / "capabilities.json"
+    registry = CapabilityRegistry(str(path))
+    registry.get("10.1.0.4").api_version = API_V1
+    registry.get("10.1.0.4").set_supported("temp", False)
+    registry.save()
+
+    restored = CapabilityRegistry(str(path))
+    restored.load()
+    assert restored.get("10.1.0.4").api_version == API_V1
+    assert restored.get("10.1.0.4").supports("temp") is False
+    assert restored.get("10.1.0.5").api_version is None
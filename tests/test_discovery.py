@@ -0,0 +1,164 @@
+"""Tests for discovering myStrom devices."""
+
+import asyncio
+import socket
+
+import pytest
+
+from pymystrom.discovery import (
+    EVENT_ADDED,
+    EVENT_CHANGED,
+    EVENT_EXPIRED,
+    STATUS_MYSTROM_ONLINE,
+    DeviceRegistry,
+    DiscoveredDevice,
+    DiscoveryProtocol,
+    DiscoveryService,
+    normalize_mac,
+    wait_for_devices,
+)
+
+MAC = bytes.fromhex("64002d112233")
+
+
+def _send(port, payload):
+    """Send an announcement to the discovery service."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.sendto(payload, ("127.0.0.1", port))
+
+
+async def _next(events):
+    """Get the next event or fail after a short time."""
+    return await asyncio.wait_for(events.__anext__(), 2)
+
+
+@pytest.mark.asyncio
+async def test_discovery_service_events():
+    """Test the added, changed and expired events of the discovery service."""
+    async with DiscoveryService(expire_after=0.3, host="127.0.0.1", port=0) as service:
+        port = service._transport.get_extra_info("sockname")[1]
+        callback_events = []
+        service.subscribe(callback_events.append)
+        events = service.events()
+        waiter = asyncio.ensure_future(_next(events))
+        await asyncio.sleep(0)
+
+        _send(port, MAC + bytes((106, 0b0110)))
+        event = await waiter
+        assert event.type == EVENT_ADDED
+        assert event.device.mac == "64:00:2d:11:22:33"
+        assert event.device.mystrom_online is True
+
+        # The same announcement again is no change
+        _send(port, MAC + bytes((106, 0b0110)))
+        # The device restarted
+        _send(port, MAC + bytes((106, 0b1110)))
+        event = await _next(events)
+        assert event.type == EVENT_CHANGED
+        assert event.changes == ("restarted",)
+        assert len(service.devices) == 1
+
+        event = await _next(events)
+        assert event.type == EVENT_EXPIRED
+        assert service.devices == []
+        assert [event.type for event in callback_events] == [
+            EVENT_ADDED,
+            EVENT_CHANGED,
+            EVENT_EXPIRED,
+        ]
+        await events.aclose()
+    assert not service.running
+
+
+@pytest.mark.asyncio
+async def test_wait_for_devices_returns_early():
+    """Test that the discovery returns once all expected devices were seen."""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+
+    async def _announce():
+        """Announce two devices shortly after the discovery started."""
+        await asyncio.sleep(0.1)
+        _send(port, MAC + bytes((106, 0)))
+        _send(port, bytes.fromhex("64002d445566") + bytes((102, 0)))
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    announce = asyncio.ensure_future(_announce())
+    result = await wait_for_devices(
+        timeout=5,
+        expected_macs=["64-00-2D-11-22-33", "64002D445566"],
+        host="127.0.0.1",
+        port=port,
+    )
+    await announce
+    assert loop.time() - start < 2
+    assert len(result.devices) == 2
+    assert result.missing == set()
+
+
+@pytest.mark.asyncio
+async def test_wait_for_devices_reports_missing():
+    """Test that expected devices not seen until the timeout are reported."""
+    result = await wait_for_devices(
+        timeout=0.2,
+        expected_count=1,
+        expected_macs=["64:00:2d:11:22:33"],
+        host="127.0.0.1",
+        port=0,
+    )
+    assert result.devices == []
+    assert result.missing == {"64:00:2d:11:22:33"}
+
+
+def test_normalize_mac():
+    """Test the normalization of MAC addresses."""
+    assert normalize_mac("64002D112233") == "64:00:2d:11:22:33"
+    assert normalize_mac("64-00-2D-11-22-33") == "64:00:2d:11:22:33"
+
+
+def test_create_from_announce_msg():
+    """Test the parsing of an announcement."""
+    device = DiscoveredDevice.create_from_announce_msg(
+        ("192.168.0.10", 7979), MAC + bytes((102, 0b0101))
+    )
+    assert device.host == "192.168.0.10"
+    assert device.mac == "64:00:2d:11:22:33"
+    assert device.type == 102
+    assert device.hardware == "Bulb"
+    assert device.is_child is True
+    assert device.mystrom_registered is False
+    assert device.mystrom_online is True
+    assert device.restarted is False
+    assert not hasattr(device, "__dict__")
+
+    device.type = 255
+    assert device.hardware == "non_mystrom"
+
+
+def test_protocol_drops_malformed_and_flooding_datagrams():
+    """Test that bad datagrams are counted instead of raising."""
+    events = []
+    registry = DeviceRegistry()
+    protocol = DiscoveryProtocol(registry, events.append, burst=2, rate=0)
+    protocol.datagram_received(b"\x00" * 3, ("10.5.0.1", 7979))
+    for _ in range(5):
+        protocol.datagram_received(MAC + bytes((106, 0)), ("10.5.0.2", 7979))
+
+    assert protocol.received == 6
+    assert protocol.malformed == 1
+    assert protocol.rate_limited == 3
+    assert [event.type for event in events] == [EVENT_ADDED]
+
+
+def test_registry_updates_known_devices_in_place():
+    """Test that announcements of known devices do not create new objects."""
+    registry = DeviceRegistry()
+    added = registry.announce("10.5.0.3", MAC, 106, 0)
+    assert registry.announce("10.5.0.3", MAC, 106, 0) is None
+    changed = registry.announce("10.5.0.4", MAC, 106, STATUS_MYSTROM_ONLINE)
+    assert changed.device is added.device
+    assert changed.changes == ("host", "mystrom_online")
+    assert added.device.host == "10.5.0.4"
+    assert registry.devices() == [added.device]
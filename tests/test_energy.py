@@ -0,0 +1,63 @@
+"""Tests for accumulating the energy of myStrom switches/plugs."""
+
+import pytest
+
+from pymystrom.energy import WS_PER_KWH, EnergyAccumulator, RingBuffer
+from pymystrom.switch import MyStromSwitch, SwitchReport
+
+START = 1_700_000_000 - 1_700_000_000 % 3600
+
+
+def _report(boot_id, energy, power=100.0):
+    """Create a report of a switch."""
+    return SwitchReport(
+        relay=True, power=power, Ws=power, boot_id=boot_id, energy_since_boot=energy
+    )
+
+
+def test_counter_continues_after_restart():
+    """Test that the counter stays monotonic if the device restarts."""
+    accumulator = EnergyAccumulator()
+    assert accumulator.add_report(_report("0000000A", 1000.0), START) == 0
+    accumulator.add_report(_report("0000000A", 1000.0 + WS_PER_KWH), START + 30)
+    assert accumulator.total == pytest.approx(1.0)
+
+    # The device restarted, the energy since then is counted
+    accumulator.add_report(_report("0000000B", WS_PER_KWH / 2), START + 90)
+    assert accumulator.total == pytest.approx(1.5)
+    accumulator.add_report(_report("0000000B", WS_PER_KWH), START + 3600)
+    assert accumulator.total == pytest.approx(2.0)
+
+    assert list(accumulator.raw)[-1] == (START + 3600, pytest.approx(2.0))
+    assert [timestamp for timestamp, _ in accumulator.minutes] == [
+        START,
+        START + 60,
+        START + 3600,
+    ]
+    assert accumulator.consumption(accumulator.hours) == [
+        (START + 3600, pytest.approx(0.5))
+    ]
+
+
+def test_legacy_firmware_integrates_power():
+    """Test the fallback to the average power without energy counter."""
+    switch = MyStromSwitch("10.10.0.1")
+    switch._report = SwitchReport(relay=True, power=100.0, Ws=100.0)
+    accumulator = EnergyAccumulator()
+    accumulator.add(switch, START)
+    accumulator.add(switch, START + 36)
+    assert accumulator.total == pytest.approx(100.0 * 36 / WS_PER_KWH)
+
+
+def test_ring_buffer_is_compact():
+    """Test that the ring buffer keeps only the newest samples."""
+    buffer = RingBuffer(3)
+    for index in range(5):
+        buffer.append(index, index * 1.5)
+    assert list(buffer) == [(2, 3.0), (3, 4.5), (4, 6.0)]
+    buffer.bucket(4, 7.0)
+    assert buffer.last() == (4, 7.0)
+    assert buffer.nbytes == 48
+
+    # A week of hourly history for 600 plugs in a few MB
+    assert EnergyAccumulator().nbytes * 600 < 8 * 1024 * 1024
@@ -0,0 +1,88 @@
+"""Tests for creating device objects from discovered devices."""
+
+import pytest
+
+import pymystrom.bulb as bulb_module
+import pymystrom.pir as pir_module
+import pymystrom.switch as switch_module
+from pymystrom.bulb import MyStromBulb
+from pymystrom.discovery import DiscoveredDevice
+from pymystrom.factory import create_device, create_fleet, device_class
+from pymystrom.pir import MyStromPir
+from pymystrom.switch import MyStromSwitch
+
+
+def _discovered(host, mac, device_type):
+    """Create a discovered device."""
+    device = DiscoveredDevice(host, mac)
+    device.type = device_type
+    return device
+
+
+def test_device_class():
+    """Test the mapping of numeric and literal device types."""
+    assert device_class(106) is MyStromSwitch
+    assert device_class("WSW") is MyStromSwitch
+    assert device_class(102) is MyStromBulb
+    assert device_class("WMS") is MyStromPir
+    assert device_class(104) is None
+    assert device_class(None) is None
+
+
+def test_create_device():
+    """Test the creation of typed device objects."""
+    bulb = create_device("10.6.0.1", 102, "5c:cf:7f:a0:c2:7c", token="secret")
+    assert isinstance(bulb, MyStromBulb)
+    assert bulb.mac == "5CCF7FA0C27C"
+    assert str(bulb.uri) == "http://10.6.0.1/api/v1/device/5CCF7FA0C27C"
+    assert bulb.token == "secret"
+    assert create_device("10.6.0.1", 102) is None
+    assert create_device("10.6.0.2", 103, "5c:cf:7f:a0:c2:7d") is None
+
+
+@pytest.mark.asyncio
+async def test_create_fleet_warm(monkeypatch):
+    """Test that a fleet is created and warmed from discovered devices."""
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function for all device types."""
+        if uri.path == "/report":
+            return {"relay": True, "power": 2.0}
+        if uri.path == "/api/v1/sensors":
+            return {"motion": False, "light": 3, "temperature": 20.0}
+        if uri.path.startswith("/api/v1/device/"):
+            mac = uri.path.rsplit("/", 1)[1]
+            return {
+                mac: {
+                    "power": 1.0,
+                    "fw_version": "2.58.0",
+                    "color": "0;0;100",
+                    "mode": "hsv",
+                    "ramp": 100,
+                    "on": True,
+                    "type": "rgblamp",
+                }
+            }
+        return {"version": "3.82.60", "mac": "AABBCCDDEEFF", "type": 106}
+
+    for module in (switch_module, bulb_module, pir_module):
+        monkeypatch.setattr(module, "request", _fake_request)
+
+    discovered = [
+        _discovered("10.6.0.3", "64:00:2d:00:00:01", 106),
+        _discovered("10.6.0.4", "5c:cf:7f:00:00:02", 102),
+        _discovered("10.6.0.5", "64:00:2d:00:00:03", 110),
+        _discovered("10.6.0.6", "64:00:2d:00:00:04", 104),
+    ]
+    fleet = await create_fleet(discovered, warm=True)
+    assert [type(device) for device in fleet.devices] == [
+        MyStromSwitch,
+        MyStromBulb,
+        MyStromPir,
+    ]
+    assert fleet.last_result.ok
+    assert fleet.devices[0].relay is True
+    assert fleet.devices[1].state is True
+    assert fleet.devices[2].sensors["light"] == 3
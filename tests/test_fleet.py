@@ -0,0 +1,81 @@
+"""Tests for refreshing a fleet of myStrom devices."""
+
+import asyncio
+
+import aiohttp
+import pytest
+
+import pymystrom.pir as pir_module
+import pymystrom.switch as switch_module
+from pymystrom.exceptions import MyStromConnectionError
+from pymystrom.fleet import MyStromFleet
+from pymystrom.pir import MyStromPir
+from pymystrom.switch import MyStromSwitch
+
+
+@pytest.mark.asyncio
+async def test_refresh_collects_errors(monkeypatch):
+    """Test that a failing device does not abort the refresh of the others."""
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function that fails for one host."""
+        if uri.host == "10.0.0.2":
+            raise MyStromConnectionError("unreachable")
+        if uri.path.endswith("/report"):
+            return {"relay": True, "power": 1.0}
+        return {"version": "3.0", "mac": "AA", "type": 106}
+
+    monkeypatch.setattr(switch_module, "request", _fake_request)
+    async with MyStromFleet(["10.0.0.1", "10.0.0.2"]) as fleet:
+        result = await fleet.refresh()
+
+    assert list(result.devices) == ["10.0.0.1"]
+    assert result.devices["10.0.0.1"].relay is True
+    assert isinstance(result.errors["10.0.0.2"], MyStromConnectionError)
+    assert not result.ok
+
+
+@pytest.mark.asyncio
+async def test_refresh_timeout_and_concurrency(monkeypatch):
+    """Test the per-device timeout and that devices are polled concurrently."""
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function with one hanging host."""
+        await asyncio.sleep(10 if uri.host == "10.0.0.9" else 0.05)
+        return {"motion": True, "light": 1, "temperature": 20.0}
+
+    monkeypatch.setattr(pir_module, "request", _fake_request)
+    devices = [MyStromPir(f"10.0.0.{i}") for i in range(1, 10)]
+    async with MyStromFleet(devices, timeout=0.2) as fleet:
+        result = await fleet.refresh()
+
+    assert len(result.devices) == 8
+    assert isinstance(result.errors["10.0.0.9"], MyStromConnectionError)
+    assert result.duration < 1
+
+
+@pytest.mark.asyncio
+async def test_session_is_shared_with_devices():
+    """Test that a given session is passed on to all devices."""
+    async with aiohttp.ClientSession() as session:
+        own_session = aiohttp.ClientSession()
+        devices = [MyStromPir("10.0.0.1"), MyStromPir("10.0.0.2", own_session)]
+        fleet = MyStromFleet(devices + ["10.0.0.3"], session=session)
+        assert [device._session for device in fleet.devices] == [
+            session,
+            own_session,
+            session,
+        ]
+        await own_session.close()
+
+
+@pytest.mark.asyncio
+async def test_add_host_creates_switch():
+    """Test that plain hosts are turned into switches."""
+    fleet = MyStromFleet(["10.0.0.1"], token="secret")
+    assert isinstance(fleet.devices[0], MyStromSwitch)
+    assert fleet.devices[0]._token == "secret"
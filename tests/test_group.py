@@ -0,0 +1,113 @@
+"""Tests for controlling groups of myStrom devices."""
+
+import asyncio
+
+import pytest
+
+import pymystrom.bulb as bulb_module
+import pymystrom.switch as switch_module
+from pymystrom.bulb import MyStromBulb
+from pymystrom.exceptions import MyStromConnectionError
+from pymystrom.group import Group
+from pymystrom.switch import MyStromSwitch
+
+DELAYS = {"10.0.0.1": 0.05, "10.0.0.2": 0.1, "10.0.0.3": 0.05, "10.0.0.4": 1.0}
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    """Record the requests sent to the fake devices."""
+    sent = []
+    relays = {}
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function with a delay per host."""
+        sent.append((uri.host, uri.path, method, params or data))
+        await asyncio.sleep(DELAYS[uri.host])
+        if uri.path.endswith("/relay"):
+            relays[uri.host] = params["state"] == "1"
+            return {}
+        if uri.path.endswith("/report"):
+            return {"relay": relays.get(uri.host, False), "power": 1.0}
+        if uri.path.startswith("/api/v1/device"):
+            return {
+                "AABBCCDDEEFF": {
+                    "type": "rgblamp",
+                    "on": data is None or "off" not in str(data),
+                    "color": "0;0;100",
+                    "mode": "hsv",
+                    "ramp": 100,
+                    "power": 0.9,
+                    "fw_version": "2.25",
+                }
+            }
+        return {"version": "3.0", "mac": "AA", "type": 106}
+
+    monkeypatch.setattr(switch_module, "request", _fake_request)
+    monkeypatch.setattr(bulb_module, "request", _fake_request)
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_commands_are_sent_concurrently(requests):
+    """Test that a group command takes as long as the slowest device."""
+    group = Group(
+        [
+            MyStromSwitch("10.0.0.1"),
+            MyStromSwitch("10.0.0.2"),
+            MyStromBulb("10.0.0.3", "AABBCCDDEEFF"),
+        ]
+    )
+    result = await group.turn_on()
+
+    assert result.ok
+    assert set(result.outcomes) == {"10.0.0.1", "10.0.0.2", "10.0.0.3"}
+    assert result.outcomes["10.0.0.2"].latency >= 0.1
+    assert result.duration < 0.2
+    # Neither the state is read back nor the firmware is fetched
+    assert [path for _, path, _, _ in requests] == [
+        "/relay",
+        "/relay",
+        "/api/v1/device/AABBCCDDEEFF",
+    ]
+    assert group.devices[0].relay is True
+
+
+@pytest.mark.asyncio
+async def test_deadline(requests):
+    """Test that slow devices are reported as failed after the deadline."""
+    group = Group([MyStromSwitch("10.0.0.1"), MyStromSwitch("10.0.0.4")], deadline=0.2)
+    result = await group.turn_off()
+
+    assert not result.ok
+    assert result.failed == ["10.0.0.4"]
+    assert isinstance(result.outcomes["10.0.0.4"].error, MyStromConnectionError)
+    assert result.duration < 0.5
+
+
+@pytest.mark.asyncio
+async def test_scene_and_verify(requests):
+    """Test a command per device and a batched verification."""
+    group = Group(
+        [
+            MyStromSwitch("10.0.0.1"),
+            MyStromSwitch("10.0.0.2"),
+            MyStromBulb("10.0.0.3", "AABBCCDDEEFF"),
+        ]
+    )
+    result = await group.apply(
+        {
+            "10.0.0.1": lambda switch: switch.turn_on(refresh=False),
+            "10.0.0.3": lambda bulb: bulb.set_color_hex("00FF0000"),
+        }
+    )
+    assert set(result.outcomes) == {"10.0.0.1", "10.0.0.3"}
+    assert ("10.0.0.3", "/api/v1/device/AABBCCDDEEFF", "POST") in [
+        sent[:3] for sent in requests
+    ]
+
+    result = await group.verify(on=True)
+    assert result.failed == ["10.0.0.2"]
+    assert group.devices[2].state is True
@@ -0,0 +1,96 @@
+"""Tests for the instrumentation of requests."""
+
+import aiohttp
+import pytest
+from aiohttp import web
+from yarl import URL
+
+from pymystrom import MyStromDevice, _request
+from pymystrom.exceptions import MyStromHTTPError
+from pymystrom.instrumentation import (
+    RequestEvent,
+    RequestStatistics,
+    add_observer,
+    create_trace_config,
+    prometheus_text,
+)
+
+
+async def _report(request):
+    """Answer with a switch report."""
+    return web.json_response({"relay": True, "power": 1.5})
+
+
+async def _error(request):
+    """Answer with an internal error."""
+    return web.Response(status=500, text="Error")
+
+
+@pytest.mark.asyncio
+async def test_request_events():
+    """Test that every request emits an event with timings."""
+    events = []
+    remove = add_observer(events.append)
+
+    app = web.Application()
+    app.add_routes([web.get("/report", _report), web.get("/error", _error)])
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base = URL.build(scheme="http", host="127.0.0.1", port=runner.addresses[0][1])
+    try:
+        async with aiohttp.ClientSession(
+            trace_configs=[create_trace_config()]
+        ) as session:
+            device = MyStromDevice("127.0.0.1", session)
+            await _request(device, uri=base / "report")
+            await _request(device, uri=base / "report")
+            with pytest.raises(MyStromHTTPError):
+                await _request(device, uri=base / "error")
+    finally:
+        remove()
+        await runner.cleanup()
+
+    assert [event.endpoint for event in events] == ["/report", "/report", "/error"]
+    first, second, error = events
+    assert first.host == "127.0.0.1"
+    assert first.method == "GET"
+    assert first.status == 200
+    assert first.bytes == len(b'{"relay": true, "power": 1.5}')
+    assert first.connect is not None
+    assert first.ttfb is not None and first.ttfb <= first.total
+    # The second request reuses the pooled connection
+    assert second.connect is None
+    assert error.status == 500
+    assert error.error == "MyStromHTTPError"
+
+
+def test_statistics_and_prometheus_export():
+    """Test the aggregation of events and the Prometheus export."""
+    statistics = RequestStatistics()
+    for host, total in (("10.4.0.1", 0.02), ("10.4.0.1", 3.0), ("10.4.0.2", 0.02)):
+        statistics(RequestEvent(host, "/report", "GET", 200, 30, total))
+    statistics(
+        RequestEvent("10.4.0.2", "/report", "GET", None, 0, 1.0, error="TimeoutError")
+    )
+
+    hosts = statistics.by_host()
+    assert hosts["10.4.0.1"].count == 2
+    assert statistics.slowest_hosts()[0][0] == "10.4.0.1"
+    assert len(statistics.slowest_hosts(0.5)) == 1
+
+    text = prometheus_text(statistics)
+    assert (
+        'mystrom_request_duration_seconds_bucket{host="10.4.0.1",endpoint="/report",'
+        'le="0.025"} 1' in text
+    )
+    assert (
+        'mystrom_request_duration_seconds_bucket{host="10.4.0.1",endpoint="/report",'
+        'le="+Inf"} 2' in text
+    )
+    assert 'mystrom_response_bytes_total{host="10.4.0.1",endpoint="/report"} 60' in text
+    assert (
+        'mystrom_request_errors_total{host="10.4.0.2",endpoint="/report",'
+        'error="TimeoutError"} 1' in text
+    )
@@ -0,0 +1,135 @@
+"""Tests for the persistent inventory of myStrom devices."""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+import pymystrom as pymystrom_module
+from pymystrom.bulb import MyStromBulb
+from pymystrom.capabilities import API_V1, API_V2, CapabilityRegistry
+from pymystrom.discovery import (
+    EVENT_ADDED,
+    EVENT_EXPIRED,
+    DiscoveredDevice,
+    DiscoveryEvent,
+)
+from pymystrom.exceptions import MyStromConnectionError
+from pymystrom.inventory import DeviceInventory
+from pymystrom.switch import MyStromSwitch
+
+
+def _discovered(host, mac, device_type):
+    """Create a discovered device."""
+    device = DiscoveredDevice(host, mac)
+    device.type = device_type
+    return device
+
+
+def test_inventory_warm_start(tmp_path):
+    """Test that a restart creates the devices and skips the API probing."""
+    path = tmp_path / "inventory.json"
+    inventory = DeviceInventory(str(path), capabilities=CapabilityRegistry())
+    inventory.update("64:00:2d:00:00:01", "10.7.0.1", type=106, api_version=API_V2)
+    inventory.update("64002D000002", "10.7.0.2", type=102, firmware="2.58.0")
+    inventory.update("64:00:2d:00:00:03", "10.7.0.3", type=104)
+    inventory.save()
+    assert {record["mac"] for record in json.loads(path.read_text())} == {
+        "64:00:2d:00:00:01",
+        "64:00:2d:00:00:02",
+        "64:00:2d:00:00:03",
+    }
+
+    capabilities = CapabilityRegistry()
+    restored = DeviceInventory(str(path), capabilities=capabilities)
+    restored.load()
+    assert len(restored) == 3
+    assert restored.get("64-00-2D-00-00-02").firmware == "2.58.0"
+    assert capabilities.get("10.7.0.1").api_version == API_V2
+
+    # Buttons are not supported
+    switch, bulb = restored.create_devices()
+    assert isinstance(switch, MyStromSwitch)
+    assert isinstance(bulb, MyStromBulb)
+    assert bulb._mac == "64002D000002"
+
+
+@pytest.mark.asyncio
+async def test_inventory_follows_discovery(tmp_path):
+    """Test that discovery events update the inventory on disk."""
+    path = tmp_path / "inventory.json"
+    inventory = DeviceInventory(
+        str(path), capabilities=CapabilityRegistry(), save_delay=0.05
+    )
+    inventory.update("64:00:2d:00:00:04", "10.7.0.4", validated=time.time())
+
+    device = _discovered("10.7.0.5", "64:00:2d:00:00:04", 106)
+    inventory.handle_event(DiscoveryEvent(EVENT_ADDED, device))
+    entry = inventory.get("64:00:2d:00:00:04")
+    assert entry.host == "10.7.0.5"
+    assert entry.type == 106
+    # A moved device has to be confirmed again
+    assert inventory.stale() == [entry]
+    # The changes are saved together later
+    for index in range(10):
+        mac = "64:00:2d:00:01:{:02x}".format(index)
+        inventory.handle_event(
+            DiscoveryEvent(EVENT_ADDED, _discovered(f"10.7.1.{index}", mac, 106))
+        )
+    assert not path.exists()
+    await asyncio.sleep(0.2)
+    records = json.loads(path.read_text())
+    assert len(records) == 11
+    assert records[0]["host"] == "10.7.0.5"
+
+    inventory.handle_event(DiscoveryEvent(EVENT_EXPIRED, device))
+    assert len(inventory) == 11
+
+    inventory.save_delay = 60
+    inventory.handle_event(
+        DiscoveryEvent(EVENT_ADDED, _discovered("10.7.0.6", "64:00:2d:00:00:04", 106))
+    )
+    await inventory.close()
+    assert json.loads(path.read_text())[0]["host"] == "10.7.0.6"
+
+
+@pytest.mark.asyncio
+async def test_inventory_revalidation(monkeypatch, tmp_path):
+    """Test that stale entries are confirmed with the device info."""
+    called = []
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function for an old, an unreachable and a moved device."""
+        called.append(self._host)
+        if self._host == "10.7.0.6":
+            if uri.path == "/api/v1/info":
+                return "Not found"
+            return {"version": "2.59.32", "mac": "64002D000006"}
+        if self._host == "10.7.0.7":
+            raise MyStromConnectionError()
+        return {"version": "3.82.60", "mac": "64002D000009", "type": 107}
+
+    monkeypatch.setattr(pymystrom_module, "_request", _fake_request)
+    path = tmp_path / "inventory.json"
+    inventory = DeviceInventory(str(path))
+    inventory.update("64:00:2d:00:00:06", "10.7.0.6", type=106)
+    inventory.update("64:00:2d:00:00:07", "10.7.0.7", type=106)
+    inventory.update("64:00:2d:00:00:08", "10.7.0.8", type=106)
+    inventory.update("64:00:2d:00:00:10", "10.7.0.10", validated=time.time())
+
+    assert await inventory.start_revalidation() == 2
+    assert "10.7.0.10" not in called
+
+    entry = inventory.get("64:00:2d:00:00:06")
+    assert entry.firmware == "2.59.32"
+    assert entry.api_version == API_V1
+    assert entry.validated > 0
+    assert inventory.get("64:00:2d:00:00:07").validated == 0
+    # The address of the third device now belongs to another device
+    assert inventory.get("64:00:2d:00:00:08") is None
+    assert inventory.get("64:00:2d:00:00:09").type == 107
+    assert len(json.loads(path.read_text())) == 4
+    await inventory.close()
@@ -0,0 +1,119 @@
+"""Tests for following the motion detected by myStrom PIRs."""
+
+import asyncio
+import time
+
+import pytest
+
+import pymystrom.pir as pir_module
+from pymystrom.motion import MotionMonitor, MotionWatcher
+from pymystrom.pir import MyStromPir
+
+
+def test_debounce():
+    """Test that only states lasting the debounce time are reported."""
+    pir = MyStromPir("10.11.0.1")
+    watcher = MotionWatcher(debounce=1.0)
+    watcher.observe(pir, False, 0.0)
+    assert watcher.queue.empty()
+    assert not watcher.active
+
+    # A short motion is ignored
+    watcher.observe(pir, True, 1.0)
+    assert watcher.active
+    watcher.observe(pir, False, 1.5)
+    assert not watcher.active
+
+    watcher.observe(pir, True, 2.0)
+    watcher.observe(pir, True, 3.0)
+    event = watcher.queue.get_nowait()
+    assert event.pir is pir
+    assert event.motion is True
+    assert event.timestamp <= time.time()
+    assert watcher.active
+
+    watcher.observe(pir, False, 4.0)
+    watcher.observe(pir, False, 5.5)
+    assert watcher.queue.get_nowait().motion is False
+    assert watcher.queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_monitor_polls_many_pirs_in_one_task(monkeypatch):
+    """Test that the edges of several PIRs are polled by a shared monitor."""
+    polled = []
+    motion = {"10.11.0.2": False, "10.11.0.3": False}
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function to return the motion of each PIR."""
+        polled.append(self._host)
+        return {"motion": motion[self._host]}
+
+    monkeypatch.setattr(pir_module, "request", _fake_request)
+    monitor = MotionMonitor(active_interval=0.01, idle_interval=0.05)
+    first = MyStromPir("10.11.0.2")
+    second = MyStromPir("10.11.0.3")
+    first_events = first.motion_events(debounce=0.02, monitor=monitor)
+    second_events = second.motion_events(debounce=0, monitor=monitor)
+    waiter = asyncio.ensure_future(asyncio.wait_for(first_events.__anext__(), 2))
+    second_waiter = asyncio.ensure_future(
+        asyncio.wait_for(second_events.__anext__(), 2)
+    )
+    await asyncio.sleep(0.1)
+    assert monitor.interval(first) == 0.05
+    assert set(monitor.pirs) == {first, second}
+
+    motion["10.11.0.2"] = True
+    event = await waiter
+    assert event.pir is first
+    assert event.motion is True
+    assert monitor.interval(first) == 0.01
+    assert not second_waiter.done()
+
+    await first_events.aclose()
+    second_waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await second_waiter
+    await second_events.aclose()
+    assert monitor.pirs == []
+    assert all(host in motion for host in polled)
+    await asyncio.sleep(0)
+    await monitor.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_pir_does_not_delay_others(monkeypatch):
+    """Test that a hanging PIR does not hold up the polls of the others."""
+    polled = {"10.11.0.4": 0, "10.11.0.5": 0}
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function where one PIR hangs."""
+        polled[self._host] += 1
+        if self._host == "10.11.0.4":
+            await asyncio.sleep(10)
+        return {"motion": False}
+
+    monkeypatch.setattr(pir_module, "request", _fake_request)
+    monitor = MotionMonitor(active_interval=0.01, idle_interval=0.01, timeout=1)
+    slow_events = MyStromPir("10.11.0.4").motion_events(monitor=monitor)
+    events = MyStromPir("10.11.0.5").motion_events(monitor=monitor)
+    waiters = [
+        asyncio.ensure_future(slow_events.__anext__()),
+        asyncio.ensure_future(events.__anext__()),
+    ]
+    await asyncio.sleep(0.3)
+
+    assert polled["10.11.0.5"] >= 10
+    # The running poll is not started again
+    assert polled["10.11.0.4"] == 1
+
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await slow_events.aclose()
+    await events.aclose()
+    await monitor.close()
@@ -130,3 +130,47 @@ async def test_get_light(monkeypatch):
     assert pir._intensity == 99
     assert pir._day is True
     assert pir._light_raw == 123
+
+
+@pytest.mark.asyncio
+async def test_refresh(monkeypatch):
+    """Test that MyStromPir.refresh requests every needed endpoint once."""
+    called = []
+    responses = {
+        "/api/v1/sensors": {"motion": True, "light": 42, "temperature": 21.2345},
+        "/api/v1/motion": {"motion": False},
+        "/api/v1/light": {"intensity": 99, "day": True, "raw": {"adc0": 1, "adc1": 2}},
+        "/temp": {"measured": 22.345, "compensated": 23.456, "compensation": 0.12345},
+        "/api/v1/settings": {"foo": "bar"},
+        "/api/v1/settings/pir": {"pir": 1},
+        "/api/v1/action": {"action": "test"},
+    }
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function to return the response of each endpoint."""
+        called.append(uri.path)
+        return responses[uri.path]
+
+    monkeypatch.setattr(pir_module, "request", _fake_request)
+    pir = MyStromPir("127.0.0.1")
+    await pir.refresh(["motion", "day", "intensity", "sensors"])
+    assert sorted(called) == ["/api/v1/light", "/api/v1/sensors"]
+    assert pir.motion is True
+    assert pir.day is True
+
+    called.clear()
+    await pir.refresh(["motion"])
+    assert called == ["/api/v1/motion"]
+    assert pir.motion is False
+
+    called.clear()
+    await pir.refresh()
+    assert len(called) == 6
+    assert "/api/v1/motion" not in called
+    assert pir.settings == {"foo": "bar"}
+    assert pir.temperature_compensated == 23.46
+
+    with pytest.raises(ValueError):
+        await pir.refresh(["humidity"])
@@ -0,0 +1,89 @@
+"""Tests for receiving the action callbacks of myStrom devices."""
+
+import asyncio
+
+import aiohttp
+import pytest
+
+import pymystrom.receiver as receiver_module
+from pymystrom.pir import MyStromPir
+from pymystrom.receiver import ActionReceiver
+from pymystrom.switch import MyStromSwitch, SwitchReport
+
+
+@pytest.mark.asyncio
+async def test_callbacks_update_devices():
+    """Test that callbacks update the devices and are published."""
+    switch = MyStromSwitch("127.0.0.1")
+    switch._report = SwitchReport(relay=False, power=10.5, boot_id="0000000A")
+    pir = MyStromPir("10.8.0.2")
+    pir._sensors = {"motion": False, "light": 42, "temperature": 21.5}
+
+    async with ActionReceiver("127.0.0.1", port=0, listen_host="127.0.0.1") as receiver:
+        receiver.add(switch)
+        receiver.add(pir, mac="64002D000002")
+        received = []
+        receiver.subscribe(received.append)
+        events = receiver.events()
+        waiter = asyncio.ensure_future(asyncio.wait_for(events.__anext__(), 2))
+        await asyncio.sleep(0)
+
+        base = f"http://127.0.0.1:{receiver.port}{receiver.path}"
+        async with aiohttp.ClientSession() as session:
+            # Without a MAC address the device is found by the sender
+            async with session.get(base, params={"action": "on"}) as response:
+                assert response.status == 200
+            url = receiver.action_url("motion", "64:00:2d:00:00:02")
+            async with session.get("http://" + url[len("get://") :]) as response:
+                assert response.status == 200
+            async with session.get(base, params={"single": "button"}) as response:
+                assert response.status == 200
+            async with session.get(base, params={"foo": "bar"}) as response:
+                assert response.status == 400
+
+        event = await waiter
+        assert event.action == "on"
+        assert event.device is switch
+        await events.aclose()
+
+    assert not receiver.running
+    assert receiver.received == 4
+    assert switch.relay is True
+    assert switch.report.power == 10.5
+    assert pir.motion is True
+    assert pir.sensors["motion"] is True
+    assert [(event.action, event.mac) for event in received] == [
+        ("on", None),
+        ("motion", "64:00:2d:00:00:02"),
+        ("single", None),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_register_sets_action_urls(monkeypatch):
+    """Test that the receiver is set as the target of the device actions."""
+    called = []
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function to record the configured actions."""
+        called.append((method, uri.path, data, token))
+
+    monkeypatch.setattr(receiver_module, "request", _fake_request)
+    receiver = ActionReceiver("192.168.0.5", port=8321)
+    await receiver.register(MyStromPir("10.8.0.3", token="secret"))
+    assert called == [
+        (
+            "POST",
+            "/api/v1/action/pir/generic",
+            "get://192.168.0.5:8321/api/mystrom?action=motion",
+            "secret",
+        ),
+        (
+            "POST",
+            "/api/v1/action/pir/no_motion",
+            "get://192.168.0.5:8321/api/mystrom?action=no_motion",
+            "secret",
+        ),
+    ]
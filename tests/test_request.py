@@ -0,0 +1,151 @@
+"""Tests for the request handling."""
+
+import asyncio
+import json
+
+import aiohttp
+import pytest
+from aiohttp import web
+from yarl import URL
+
+from pymystrom import (
+    MAX_RESPONSE_SIZE,
+    SESSION_MANAGER,
+    MyStromDevice,
+    _request,
+    configure_session,
+)
+from pymystrom.exceptions import (
+    MyStromAuthenticationError,
+    MyStromConnectionError,
+    MyStromHTTPError,
+)
+
+
+async def _start_server(routes):
+    """Start a local HTTP server with the given routes."""
+    app = web.Application()
+    app.add_routes(routes)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, URL.build(scheme="http", host="127.0.0.1", port=port)
+
+
+async def _slow_body(request):
+    """Send the headers right away but the body only after a delay."""
+    response = web.StreamResponse(headers={"Content-Type": "application/json"})
+    await response.prepare(request)
+    await asyncio.sleep(float(request.query.get("delay", "0")))
+    await response.write(b'{"relay": true}')
+    return response
+
+
+@pytest.mark.asyncio
+async def test_timeout_covers_body_read():
+    """Test that a stalled body read is bounded by the timeout of the device."""
+    runner, base = await _start_server([web.get("/report", _slow_body)])
+    try:
+        async with aiohttp.ClientSession() as session:
+            device = MyStromDevice(
+                "127.0.0.1", session, timeout=aiohttp.ClientTimeout(sock_read=0.1)
+            )
+            url = base.join(URL("report")).with_query(delay="1")
+            with pytest.raises(MyStromConnectionError):
+                await _request(device, uri=url)
+
+            # The timeout of the call takes precedence
+            response = await _request(
+                device, uri=url, timeout=aiohttp.ClientTimeout(total=3)
+            )
+            assert response == {"relay": True}
+    finally:
+        await runner.cleanup()
+
+
+async def _status(request):
+    """Answer with the requested status code."""
+    return web.Response(status=int(request.query["status"]), text="Error")
+
+
+async def _text(request):
+    """Answer with a plain text body of the requested size."""
+    return web.Response(text="x" * int(request.query.get("size", "2")))
+
+
+@pytest.mark.asyncio
+async def test_responses_are_released():
+    """Test that error and text responses do not leak connections."""
+    runner, base = await _start_server(
+        [web.get("/status", _status), web.get("/text", _text)]
+    )
+    try:
+        connector = aiohttp.TCPConnector(limit=1)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            device = MyStromDevice(
+                "127.0.0.1", session, timeout=aiohttp.ClientTimeout(total=2)
+            )
+            for status in (500, 503, 400):
+                url = base.join(URL("status")).with_query(status=status)
+                with pytest.raises(MyStromHTTPError) as excinfo:
+                    await _request(device, uri=url)
+                assert excinfo.value.status == status
+
+            url = base.join(URL("status")).with_query(status=401)
+            with pytest.raises(MyStromAuthenticationError):
+                await _request(device, uri=url)
+
+            response = await _request(device, uri=base.join(URL("text")))
+            assert response == "xx"
+
+            url = base.join(URL("text")).with_query(size=MAX_RESPONSE_SIZE + 1)
+            with pytest.raises(MyStromConnectionError):
+                await _request(device, uri=url)
+
+            # The single connection of the pool is still usable
+            assert await _request(device, uri=base.join(URL("text"))) == "xx"
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_json_decoder_is_configurable(monkeypatch):
+    """Test that JSON bodies are passed as bytes to the configured decoder."""
+    decoded = []
+
+    def _loads(body):
+        """Record the raw body and decode it."""
+        decoded.append(body)
+        return json.loads(body)
+
+    monkeypatch.setattr(SESSION_MANAGER, "json_loads", SESSION_MANAGER.json_loads)
+    configure_session(json_loads=_loads)
+    runner, base = await _start_server([web.get("/report", _slow_body)])
+    try:
+        async with aiohttp.ClientSession() as session:
+            device = MyStromDevice("127.0.0.1", session)
+            response = await _request(device, uri=base.join(URL("report")))
+    finally:
+        await runner.cleanup()
+    assert response == {"relay": True}
+    assert decoded == [b'{"relay": true}']
+
+
+async def _empty_json(request):
+    """Answer a command with an empty JSON response."""
+    return web.Response(body=b"", content_type="application/json")
+
+
+@pytest.mark.asyncio
+async def test_empty_json_response():
+    """Test that an empty JSON response is returned as None."""
+    runner, base = await _start_server([web.post("/relay", _empty_json)])
+    try:
+        async with aiohttp.ClientSession() as session:
+            device = MyStromDevice("127.0.0.1", session)
+            url = base.join(URL("relay"))
+            assert await _request(device, uri=url, method="POST") is None
+    finally:
+        await runner.cleanup()
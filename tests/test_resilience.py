@@ -0,0 +1,147 @@
+"""Tests for the retry policy and the circuit breaker."""
+
+import asyncio
+
+import aiohttp
+import pytest
+
+import pymystrom.resilience as resilience_module
+from pymystrom import MyStromDevice, _request
+from pymystrom.exceptions import MyStromCircuitOpenError, MyStromConnectionError
+from pymystrom.resilience import (
+    CIRCUIT_BREAKERS,
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    RetryPolicy,
+    set_retry_policy,
+)
+
+
+class _HangingSession:
+    """Fake session where every request hangs."""
+
+    def request(self, method, uri, **kwargs):
+        """Return a request that never completes."""
+        return self
+
+    async def __aenter__(self):
+        """Wait forever."""
+        await asyncio.Event().wait()
+
+    async def __aexit__(self, *exc_info):
+        """Nothing to release."""
+
+
+class _FailingSession:
+    """Fake session where every request fails."""
+
+    def __init__(self):
+        """Initialize the fake session."""
+        self.calls = 0
+
+    def request(self, method, uri, **kwargs):
+        """Fail the request."""
+        self.calls += 1
+        raise aiohttp.ClientConnectionError()
+
+
+def test_circuit_breaker_states(monkeypatch):
+    """Test the transitions from closed to open to half-open and back."""
+    now = [100.0]
+    monkeypatch.setattr(resilience_module.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5)
+
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+
+    now[0] += 5
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.allow_request()
+    # Only one probe is allowed while half-open
+    assert not breaker.allow_request()
+
+    # A failed probe opens the circuit again
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+
+    now[0] += 5
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_request_skips_open_circuit():
+    """Test that a host with an open circuit is skipped without a request."""
+    session = _FailingSession()
+    device = MyStromDevice("10.3.0.1", session)
+    url = device.uri / "report"
+    for _ in range(CIRCUIT_BREAKERS.failure_threshold):
+        with pytest.raises(MyStromConnectionError) as excinfo:
+            await _request(device, uri=url)
+        assert not isinstance(excinfo.value, MyStromCircuitOpenError)
+
+    with pytest.raises(MyStromCircuitOpenError):
+        await _request(device, uri=url)
+    assert session.calls == CIRCUIT_BREAKERS.failure_threshold
+    CIRCUIT_BREAKERS.reset("10.3.0.1")
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_is_released():
+    """Test that a cancelled probe does not block the host for good."""
+    device = MyStromDevice("10.3.0.2", _FailingSession())
+    url = device.uri / "report"
+    for _ in range(CIRCUIT_BREAKERS.failure_threshold):
+        with pytest.raises(MyStromConnectionError):
+            await _request(device, uri=url)
+    breaker = CIRCUIT_BREAKERS.get("10.3.0.2")
+    breaker._opened_at -= breaker.reset_timeout
+
+    device = MyStromDevice("10.3.0.2", _HangingSession())
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(_request(device, uri=url), 0.05)
+    # The cancelled probe counts as failed
+    assert breaker.state == STATE_OPEN
+
+    breaker._opened_at -= breaker.reset_timeout
+    assert breaker.allow_request()
+    CIRCUIT_BREAKERS.reset("10.3.0.2")
+
+
+@pytest.mark.asyncio
+async def test_request_retries_idempotent_requests(monkeypatch):
+    """Test that only idempotent requests are retried."""
+    monkeypatch.setattr(
+        resilience_module, "RETRY_POLICY", resilience_module.RETRY_POLICY
+    )
+    set_retry_policy(RetryPolicy(retries=2, backoff=0.001))
+    session = _FailingSession()
+    device = MyStromDevice("10.3.0.2", session)
+
+    with pytest.raises(MyStromConnectionError):
+        await _request(device, uri=device.uri / "report")
+    assert session.calls == 3
+
+    session.calls = 0
+    with pytest.raises(MyStromConnectionError):
+        await _request(device, uri=device.uri / "toggle")
+    assert session.calls == 1
+
+    session.calls = 0
+    with pytest.raises(MyStromConnectionError):
+        await _request(device, uri=device.uri / "relay", method="POST")
+    assert session.calls == 1
+    CIRCUIT_BREAKERS.reset("10.3.0.2")
+
+
+def test_retry_delay_is_bounded():
+    """Test that the backoff never exceeds the maximum."""
+    policy = RetryPolicy(retries=10, backoff=1, max_backoff=3)
+    assert all(0 <= policy.delay(attempt) <= 3 for attempt in range(10))
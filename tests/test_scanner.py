@@ -0,0 +1,82 @@
+"""Tests for actively scanning a network for myStrom devices."""
+
+import asyncio
+
+import pytest
+
+import pymystrom as pymystrom_module
+from pymystrom.bulb import MyStromBulb
+from pymystrom.capabilities import CAPABILITIES
+from pymystrom.exceptions import MyStromAuthenticationError, MyStromConnectionError
+from pymystrom.resilience import CIRCUIT_BREAKERS
+from pymystrom.scanner import scan_network
+from pymystrom.switch import MyStromSwitch
+
+DEVICES = {
+    "10.7.0.2": {"version": "3.82.60", "mac": "64002D000002", "type": 106},
+    "10.7.0.3": {"version": "2.58.0", "mac": "5CCF7F000003", "type": "WRB"},
+    "10.7.0.5": {"version": "2.59.32", "mac": "64002D000005"},
+    "10.7.0.6": {"version": "3.82.60", "mac": "64002D000006", "type": 104},
+}
+
+
+@pytest.mark.asyncio
+async def test_scan_network(monkeypatch):
+    """Test that all myStrom devices of a network are found concurrently."""
+    in_flight = 0
+    max_in_flight = 0
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function that only answers for known hosts."""
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        assert self._timeout.sock_connect == 0.25
+        if uri.host not in DEVICES:
+            raise MyStromConnectionError("unreachable")
+        return DEVICES[uri.host]
+
+    monkeypatch.setattr(pymystrom_module, "_request", _fake_request)
+    found = [
+        device
+        async for device in scan_network(
+            "10.7.0.0/29", concurrency=3, connect_timeout_ms=250
+        )
+    ]
+
+    by_host = {device._host: device for device in found}
+    assert sorted(by_host) == ["10.7.0.2", "10.7.0.3", "10.7.0.5"]
+    assert isinstance(by_host["10.7.0.2"], MyStromSwitch)
+    assert isinstance(by_host["10.7.0.3"], MyStromBulb)
+    assert by_host["10.7.0.3"].mac == "5CCF7F000003"
+    # Legacy firmware without type
+    assert isinstance(by_host["10.7.0.5"], MyStromSwitch)
+    assert max_in_flight == 3
+    # No records are kept for addresses without a device
+    assert "10.7.0.4" not in CAPABILITIES._capabilities
+    assert "10.7.0.4" not in CIRCUIT_BREAKERS._breakers
+
+
+@pytest.mark.asyncio
+async def test_scan_network_with_token(monkeypatch):
+    """Test that the token is sent with the probe."""
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function for a device that requires a token."""
+        if uri.host != "10.7.1.2":
+            raise MyStromConnectionError("unreachable")
+        if token != "secret":
+            raise MyStromAuthenticationError(401, "unauthorized")
+        return DEVICES["10.7.0.2"]
+
+    monkeypatch.setattr(pymystrom_module, "_request", _fake_request)
+    found = [device async for device in scan_network("10.7.1.0/30", token="secret")]
+
+    assert [device._host for device in found] == ["10.7.1.2"]
+    assert found[0]._token == "secret"
@@ -0,0 +1,89 @@
+"""Tests for the adaptive polling of myStrom devices."""
+
+import asyncio
+import time
+
+import pytest
+
+import pymystrom.pir as pir_module
+import pymystrom.switch as switch_module
+from pymystrom.pir import MyStromPir
+from pymystrom.scheduler import PollingScheduler, has_changed
+from pymystrom.switch import MyStromSwitch
+
+
+def test_change_detection():
+    """Test that only relay, motion and significant power changes count."""
+    assert has_changed(None, (True, 10.0))
+    assert has_changed((True, 10.0), (False, 10.0))
+    assert not has_changed((True, 10.0), (True, 11.5))
+    assert has_changed((True, 100.0), (True, 115.0))
+    assert not has_changed((False, None), (False, None))
+
+
+@pytest.mark.asyncio
+async def test_intervals_adapt_to_changes(monkeypatch):
+    """Test that busy devices are polled faster than idle ones."""
+    polled = []
+    reports = []
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function for a busy switch and an idle PIR."""
+        polled.append((self._host, time.monotonic()))
+        if uri.path == "/report":
+            # The relay of the switch changes with every report
+            reports.append(uri)
+            return {"relay": len(reports) % 2 == 0, "power": 0}
+        if uri.path == "/api/v1/sensors":
+            return {"motion": False, "light": 42, "temperature": 21.5}
+        return {"version": "3.82.60", "mac": "64002D000011", "type": 106}
+
+    monkeypatch.setattr(switch_module, "request", _fake_request)
+    monkeypatch.setattr(pir_module, "request", _fake_request)
+    switch = MyStromSwitch("10.9.0.1")
+    pir = MyStromPir("10.9.0.2")
+    updates = []
+    scheduler = PollingScheduler(
+        [switch, pir],
+        min_interval=0.02,
+        max_interval=0.5,
+        backoff=2,
+        budget=200,
+        callback=lambda device, changed: updates.append((device, changed)),
+    )
+    async with scheduler:
+        await asyncio.sleep(0.4)
+
+    intervals = scheduler.intervals
+    assert intervals["10.9.0.2"] > intervals["10.9.0.1"]
+    assert scheduler.interval("10.9.0.1") < 0.1
+    assert scheduler.interval("10.9.0.3") is None
+    pir_updates = [changed for device, changed in updates if device is pir]
+    assert pir_updates[0] is True
+    assert not any(pir_updates[1:])
+    hosts = [host for host, _ in polled]
+    assert hosts.count("10.9.0.2") < hosts.count("10.9.0.1")
+
+
+@pytest.mark.asyncio
+async def test_budget_spreads_polls(monkeypatch):
+    """Test that the polls of all devices respect the request budget."""
+    polled = []
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function for idle PIRs."""
+        polled.append(time.monotonic())
+        return {"motion": False, "light": 42, "temperature": 21.5}
+
+    monkeypatch.setattr(pir_module, "request", _fake_request)
+    pirs = [MyStromPir(f"10.9.1.{index}") for index in range(10)]
+    async with PollingScheduler(pirs, min_interval=0.01, budget=50):
+        await asyncio.sleep(0.3)
+
+    assert 10 <= len(polled) <= 17
+    gaps = [b - a for a, b in zip(polled, polled[1:])]
+    assert min(gaps) > 0.015
@@ -0,0 +1,130 @@
+"""Tests for the shared client session."""
+
+import asyncio
+import gc
+import warnings
+
+import pytest
+from aiohttp import web
+from yarl import URL
+
+import pymystrom
+import pymystrom.session as session_module
+from pymystrom.pir import MyStromPir
+from pymystrom.session import SessionManager, close_session
+
+
+@pytest.mark.asyncio
+async def test_get_session_is_reused():
+    """Test that the same session is returned until it is closed."""
+    manager = SessionManager(limit=10, limit_per_host=1)
+    session = manager.get_session()
+    assert manager.get_session() is session
+    assert session.connector.limit == 10
+    assert session.connector.limit_per_host == 1
+
+    await manager.close()
+    assert session.closed
+    assert manager.session is None
+    assert manager.get_session() is not session
+    await manager.close()
+
+
+def test_configure_rejects_unknown_settings():
+    """Test that only known settings can be configured."""
+    manager = SessionManager()
+    manager.configure(limit=5)
+    assert manager.limit == 5
+    with pytest.raises(TypeError):
+        manager.configure(unknown=1)
+
+
+@pytest.mark.asyncio
+async def test_devices_use_shared_session(monkeypatch):
+    """Test that devices without a session use the shared session."""
+    used = []
+
+    class _FakeSession:
+        """Fake session that records requests and fails them."""
+
+        def request(self, method, uri, **kwargs):
+            """Record the request."""
+            used.append(self)
+            raise pymystrom.aiohttp.ClientError()
+
+    fake_session = _FakeSession()
+    monkeypatch.setattr(pymystrom.SESSION_MANAGER, "get_session", lambda: fake_session)
+    for host in ("10.2.0.1", "10.2.0.2"):
+        pir = MyStromPir(host)
+        with pytest.raises(pymystrom.MyStromConnectionError):
+            await pir.get_motion()
+        assert pir._session is None
+    assert used == [fake_session, fake_session]
+
+
+async def _report(request):
+    """Return the report of a switch."""
+    return web.json_response({"relay": True, "power": 1.0})
+
+
+async def _get_report():
+    """Get the report from a local server with a device using the shared pool."""
+    app = web.Application()
+    app.router.add_get("/report", _report)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    try:
+        async with pymystrom.MyStromDevice("127.0.0.1") as device:
+            url = URL.build(scheme="http", host="127.0.0.1", port=port, path="/report")
+            return await pymystrom._request(device, uri=url)
+    finally:
+        await runner.cleanup()
+
+
+def _run_and_collect(*coros):
+    """Run each coroutine in its own event loop, return the resource warnings."""
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ResourceWarning)
+        for coro in coros:
+            asyncio.run(coro)
+        gc.collect()
+    return [warning for warning in caught if warning.category is ResourceWarning]
+
+
+def test_close_session_leaves_no_open_session(monkeypatch):
+    """Test that closing the shared session releases all connections."""
+    manager = SessionManager()
+    monkeypatch.setattr(pymystrom, "SESSION_MANAGER", manager)
+    monkeypatch.setattr(session_module, "SESSION_MANAGER", manager)
+
+    async def _main():
+        try:
+            assert (await _get_report())["relay"] is True
+        finally:
+            await close_session()
+
+    assert _run_and_collect(_main()) == []
+    assert manager.session is None
+
+
+def test_session_of_previous_loop_is_closed(monkeypatch):
+    """Test that a session left open by a finished event loop is closed."""
+    manager = SessionManager()
+    monkeypatch.setattr(pymystrom, "SESSION_MANAGER", manager)
+    monkeypatch.setattr(session_module, "SESSION_MANAGER", manager)
+    sessions = []
+
+    async def _main():
+        await _get_report()
+        sessions.append(manager.session)
+
+    async def _last():
+        await _main()
+        await close_session()
+
+    assert _run_and_collect(_main(), _last()) == []
+    assert sessions[0] is not sessions[1]
+    assert sessions[0].closed
@@ -1,9 +1,11 @@
 """Tests for myStrom Switch devices."""
 
+import dataclasses
+
 import pytest
 
 import pymystrom.switch as switch_module
-from pymystrom.switch import MyStromSwitch
+from pymystrom.switch import MyStromSwitch, SwitchReport
 
 
 @pytest.mark.asyncio
@@ -105,3 +107,101 @@ async def test_get_state(monkeypatch):
     assert (
         sw.device_type is None
     )  # Because DEVICE_MAPPING_LITERAL.get("SWITCH") is None by default
+
+
+@pytest.mark.asyncio
+async def test_get_state_caches_info(monkeypatch):
+    """Test MyStromSwitch.get_state only fetches the device info when needed."""
+    called = []
+    report = {"relay": True, "power": 1.0, "boot_id": "A"}
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function to record the requested endpoints."""
+        called.append(uri.path)
+        if uri.path == "/report":
+            return dict(report)
+        return {"version": "3.0", "mac": "AA:BB:CC:DD:EE:FF", "type": 106}
+
+    monkeypatch.setattr(switch_module, "request", _fake_request)
+    sw = MyStromSwitch("127.0.0.1")
+    await sw.get_state()
+    await sw.get_state()
+    assert called == ["/report", "/api/v1/info", "/report"]
+
+    # A restart of the device invalidates the cached info
+    called.clear()
+    report["boot_id"] = "B"
+    await sw.get_state()
+    assert called == ["/report", "/api/v1/info"]
+
+    # An expired TTL invalidates the cached info
+    called.clear()
+    sw._info_expires = 0
+    await sw.get_state()
+    assert called == ["/report", "/api/v1/info"]
+
+
+@pytest.mark.asyncio
+async def test_get_report(monkeypatch):
+    """Test MyStromSwitch.get_report only requests the report."""
+    called = []
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function to record the requested endpoints."""
+        called.append(uri.path)
+        return {"relay": False, "power": 0.0, "temperature": 21.34}
+
+    monkeypatch.setattr(switch_module, "request", _fake_request)
+    sw = MyStromSwitch("127.0.0.1")
+    await sw.get_report()
+    assert called == ["/report"]
+    assert sw.relay is False
+    assert sw.temperature == 21.3
+    assert sw.firmware is None
+
+
+@pytest.mark.asyncio
+async def test_report_snapshot(monkeypatch):
+    """Test MyStromSwitch keeps an immutable snapshot of the report."""
+    fake_report = {
+        "relay": True,
+        "power": 12.345,
+        "Ws": 11.98,
+        "boot_id": "B00T",
+        "energy_since_boot": 1234.567,
+        "time_since_boot": 3600,
+        "temperature": 22.25,
+    }
+
+    async def _fake_request(
+        self, uri, method="GET", data=None, json_data=None, params=None, token=None
+    ):
+        """Fake request function to return the report."""
+        return fake_report
+
+    monkeypatch.setattr(switch_module, "request", _fake_request)
+    sw = MyStromSwitch("127.0.0.1")
+    assert sw.relay is False
+    assert sw.consumption == 0
+
+    await sw.get_report()
+    snapshot = sw.report
+    assert isinstance(snapshot, SwitchReport)
+    assert not hasattr(snapshot, "__dict__")
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        snapshot.relay = False
+    assert sw.relay is True
+    assert sw.consumption == 12.3
+    assert sw.consumedWs == 12.0
+    assert sw.boot_id == "B00T"
+    assert sw.energy_since_boot == 1234.57
+    assert sw.time_since_boot == 3600
+    assert sw.temperature == 22.2
+
+    await sw.get_report()
+    assert sw.report is not snapshot
+    assert sw.report == snapshot